@@ -0,0 +1,262 @@
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from streaming import StreamingTrends
+from trends import periods
+
+
+class LevelIndex:
+    """
+    Sorted array of price levels for one ticker.
+
+    Finding the levels a bar crossed is two binary searches plus the number
+    of levels actually crossed, so the cost grows with log(levels) rather
+    than with the number of levels watched.
+    """
+
+    def __init__(self):
+        self.prices = np.empty(0)
+        self.ids = np.empty(0, dtype=np.int64)
+        self._new = []
+
+    def add(self, price, level_id):
+        self._new.append((price, level_id))
+
+    def remove(self, level_id):
+        self._build()
+        keep = self.ids != level_id
+        self.prices, self.ids = self.prices[keep], self.ids[keep]
+
+    def _build(self):
+        # Levels are added in batches, so sort once on the next query instead of on every add
+        if self._new:
+            prices = np.concatenate([self.prices, [price for price, _ in self._new]])
+            ids = np.concatenate([self.ids, np.array([level_id for _, level_id in self._new], dtype=np.int64)])
+            order = np.argsort(prices, kind="stable")
+            self.prices, self.ids = prices[order], ids[order]
+            self._new = []
+
+    def crossed(self, low, high):
+        """Ids of the levels with low <= price <= high."""
+        self._build()
+        lo = np.searchsorted(self.prices, low, side="left")
+        hi = np.searchsorted(self.prices, high, side="right")
+        return self.ids[lo:hi]
+
+    def __len__(self):
+        return len(self.prices) + len(self._new)
+
+
+def support_levels(daily_df, window=5, count=3):
+    """
+    Recent pivot lows below the last close: days whose low is the lowest of
+    the window days either side of them.
+
+    Parameters:
+    daily_df (DataFrame): Daily bars
+    window (int): Days either side a pivot low has to be the lowest of
+    count (int): Number of levels to return, nearest to the price first
+
+    Returns:
+    list: Support prices
+    """
+    daily_df = daily_df.sort_values("date")
+    low = daily_df["low"].reset_index(drop=True)
+    pivots = low[low == low.rolling(2 * window + 1, center=True, min_periods=window + 1).min()]
+    last_close = daily_df["close"].iloc[-1]
+    below = pivots[pivots < last_close].drop_duplicates()
+    return sorted(below.tolist(), reverse=True)[:count]
+
+
+class AlertEngine:
+    """
+    Watches price levels (Discord entry and S/L, support levels) and trend
+    crossings for every ticker and reports them as bars arrive.
+
+    Each level fires once when a bar trades through it and is then disarmed
+    until rearm() is called. Trend crossings fire when a minute period trend
+    from StreamingTrends changes sign.
+    """
+
+    def __init__(self, periods=periods, cross_periods=("30m", "1h", "3h"), latency_window=10000):
+        """
+        Parameters:
+        periods (list): (label, window) pairs, the minute periods are streamed
+        cross_periods (tuple): Labels of the minute periods whose sign changes raise alerts
+        latency_window (int): Number of recent per-bar check latencies kept
+        """
+        self.levels = {}
+        self.indexes = {}
+        self.last_close = {}
+        self.trends = StreamingTrends(periods, columns=("close",))
+        self.cross_mask = np.array([label in cross_periods for label, _ in self.trends.periods])
+        self.handlers = []
+        self.latencies = deque(maxlen=latency_window)
+        self._next_id = 0
+
+    def add_level(self, ticker, price, kind, label=""):
+        """
+        Watch a price level.
+
+        Parameters:
+        ticker (str): The stock ticker symbol
+        price (float): Level price
+        kind (str): e.g. 'entry', 'stop' or 'support'
+        label (str): Free text included in the alert
+
+        Returns:
+        int: Level id, for remove_level
+        """
+        level_id = self._next_id
+        self._next_id += 1
+        self.levels[level_id] = {"ticker": ticker, "price": float(price), "kind": kind, "label": label, "armed": True}
+        self.indexes.setdefault(ticker, LevelIndex()).add(float(price), level_id)
+        return level_id
+
+    def remove_level(self, level_id):
+        level = self.levels.pop(level_id)
+        self.indexes[level["ticker"]].remove(level_id)
+
+    def rearm(self, ticker=None):
+        for level in self.levels.values():
+            if ticker is None or level["ticker"] == ticker:
+                level["armed"] = True
+
+    def load_discord_levels(self, posts):
+        """Watch the Entry and SL of the latest post of every ticker in discord_tickers.csv."""
+        latest = posts.dropna(subset=["Date"]).sort_values("Date").groupby("Ticker").tail(1)
+        for post in latest.itertuples(index=False):
+            if pd.notna(post.Entry):
+                self.add_level(post.Ticker, post.Entry, "entry", f"Discord entry {post.Date}")
+            if pd.notna(post.SL):
+                self.add_level(post.Ticker, post.SL, "stop", f"Discord S/L {post.Date}")
+
+    def add_support_levels(self, ticker, daily_df, **kwargs):
+        for price in support_levels(daily_df, **kwargs):
+            self.add_level(ticker, price, "support", "Daily pivot low")
+
+    def on_alert(self, handler):
+        self.handlers.append(handler)
+
+    def _emit(self, alert):
+        for handler in self.handlers:
+            handler(alert)
+
+    def _check_levels(self, ticker, at, high, low, close):
+        # The checked range is extended to the previous price so a move that
+        # gaps through a level still triggers it
+        alerts = []
+        prev_close = self.last_close.get(ticker)
+        lo, hi = low, high
+        if prev_close is not None:
+            lo, hi = min(lo, prev_close), max(hi, prev_close)
+        self.last_close[ticker] = close
+
+        index = self.indexes.get(ticker)
+        if index is not None and len(index):
+            for level_id in index.crossed(lo, hi):
+                level = self.levels[level_id]
+                if level["armed"]:
+                    level["armed"] = False
+                    alerts.append({"ticker": ticker, "time": at, "kind": level["kind"], "label": level["label"],
+                                   "level": level["price"], "price": close})
+        return alerts
+
+    def _finish(self, alerts, started):
+        latency = time.perf_counter() - started
+        self.latencies.append(latency)
+        for alert in alerts:
+            alert["latency_us"] = latency * 1e6
+            self._emit(alert)
+        return alerts
+
+    def on_bar(self, ticker, bar_time, high, low, close):
+        """
+        Check one completed minute bar against the ticker's levels and trends.
+
+        Returns:
+        list: Alerts raised by this bar
+        """
+        started = time.perf_counter()
+        alerts = self._check_levels(ticker, bar_time, high, low, close)
+
+        before = self.trends.buffers[ticker].trends[0] if ticker in self.trends.buffers else None
+        after = self.trends.on_bar(ticker, bar_time, {"close": close})[0]
+        if before is not None:
+            flipped = np.flatnonzero((np.sign(before) * np.sign(after) < 0) & self.cross_mask)
+            for i in flipped:
+                label, _ = self.trends.periods[i]
+                direction = "up" if after[i] > 0 else "down"
+                alerts.append({"ticker": ticker, "time": bar_time, "kind": "trend_cross",
+                               "label": f"{label} trend turned {direction}", "level": 0.0, "price": close})
+        return self._finish(alerts, started)
+
+    def on_tick(self, ticker, tick_time, price):
+        """
+        Check one trade price against the ticker's levels only. Ticks are not
+        bars, so they are kept out of the minute trend buffers.
+
+        Returns:
+        list: Alerts raised by this tick
+        """
+        started = time.perf_counter()
+        return self._finish(self._check_levels(ticker, tick_time, price, price, price), started)
+
+    def latency_stats(self):
+        """Per-bar check latency in microseconds."""
+        if not self.latencies:
+            return {"bars": 0}
+        lat = np.array(self.latencies) * 1e6
+        return {
+            "bars": len(lat),
+            "levels": len(self.levels),
+            "mean_us": float(lat.mean()),
+            "p50_us": float(np.percentile(lat, 50)),
+            "p99_us": float(np.percentile(lat, 99)),
+            "max_us": float(lat.max()),
+        }
+
+    def _on_history_update(self, bars, hasNewBar):
+        # With keepUpToDate the last bar is still forming, so the bar before it just completed
+        if not hasNewBar or len(bars) < 2:
+            return
+        bar = bars[-2]
+        self.on_bar(bars.contract.symbol, bar.date, bar.high, bar.low, bar.close)
+
+    def subscribe(self, ib, contract):
+        """
+        Watch live 1 minute bars for a contract.
+
+        Parameters:
+        ib (IB): Connected ib_insync.IB, or a ReplayIB for testing
+        contract (Contract): Contract to watch, its symbol is used as the ticker
+        """
+        bars = ib.reqHistoricalData(contract, endDateTime="", durationStr="1 D", barSizeSetting="1 min",
+                                    whatToShow="TRADES", useRTH=False, keepUpToDate=True)
+        history = [(bar.date, bar.close) for bar in bars[:-1]]
+        if history:
+            self.trends.seed(contract.symbol, pd.DataFrame(history, columns=["date", "close"]))
+            self.last_close[contract.symbol] = history[-1][1]
+        bars.updateEvent += self._on_history_update
+        return bars
+
+
+if __name__ == "__main__":
+    from ib_insync import IB, Stock
+
+    posts = pd.read_csv('discord_tickers.csv')
+    engine = AlertEngine()
+    engine.load_discord_levels(posts)
+    engine.on_alert(lambda alert: print(alert))
+
+    ib = IB()
+    ib.connect(host='172.21.224.1', port=7497, clientId=207, timeout=10)
+    for ticker in sorted(engine.indexes):
+        engine.subscribe(ib, Stock(ticker, "SMART", "USD"))
+    try:
+        while True:
+            ib.sleep(60)
+            print(engine.latency_stats())
+    except KeyboardInterrupt:
+        ib.disconnect()
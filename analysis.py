@@ -2,10 +2,42 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import pandas as pd
 from datetime import datetime, timedelta
-from data import fetch_yfinance_data
+from data import fetch_yfinance_data, slice_bars
+from cache import BarCache
+from bars import Bars
+from instrument import span, traced
 import matplotlib.ticker as mticker
 
-def analyse_stock(ticker, date, time, target_date=None, combined_plot=True):
+def window_bars(minute_df, start_date, end_date):
+    """
+    Select the minute bars between two dates and add the plotting columns.
+    
+    Parameters:
+    minute_df (DataFrame or Bars): Minute bars
+    start_date (date): First day to keep
+    end_date (date): Last day to keep (inclusive)
+    
+    Returns:
+    DataFrame: Bars with plot_date (exchange time, tz-naive) and per-day cumulative_volume
+    """
+    if len(minute_df) == 0:
+        return pd.DataFrame()
+    
+    # Only the selected window is copied, found by binary search on the timestamps
+    if isinstance(minute_df, Bars):
+        window = minute_df.between(start_date, end_date + timedelta(days=1))
+        day_df = window.to_frame()
+        day_df['plot_date'] = window.local_dates()
+    else:
+        day_df = slice_bars(minute_df, start_date, end_date + timedelta(days=1)).copy()
+        # Format date for plotting
+        day_df['plot_date'] = day_df['date'].dt.tz_localize(None)
+    
+    # Calculate cumulative volume for each day
+    day_df['cumulative_volume'] = day_df.groupby(day_df['plot_date'].dt.normalize())['volume'].cumsum()
+    return day_df
+
+def analyse_stock(ticker, date, time, target_date=None, combined_plot=True, cache=None, source=None):
     """
     Analyse stock data around a specific date and time.
     
@@ -15,6 +47,8 @@ def analyse_stock(ticker, date, time, target_date=None, combined_plot=True):
     time (str): Time in format 'HH:MM'
     target_date (str): Optional target date to override the date range calculation
     combined_plot (bool): Whether to show price and volume in a combined plot
+    cache (BarCache): Optional on-disk bar store to fetch the data through
+    source: Optional bar source such as a sources.DataRouter, used instead of cache
     
     Returns:
     tuple: Daily and minute dataframes
@@ -46,23 +80,22 @@ def analyse_stock(ticker, date, time, target_date=None, combined_plot=True):
             display_date = target_date
     
     # Fetch data (use end_date + 1 to ensure we get all data)
-    daily_df, minute_df = fetch_yfinance_data(ticker, str(end_date + timedelta(days=1)))
+    with span("analysis.fetch", ticker=ticker):
+        daily_df, minute_df = fetch_yfinance_data(ticker, str(end_date + timedelta(days=1)), cache=cache,
+                                                 source=source)
     
-    # Format date for plotting
-    minute_df['plot_date'] = pd.to_datetime(minute_df['date']).dt.tz_localize(None)
-    
-    # Filter for the 3-day range
-    mask = (minute_df['plot_date'].dt.date >= start_date) & (minute_df['plot_date'].dt.date <= end_date)
-    day_df = minute_df[mask]
+    with span("analysis.window", ticker=ticker):
+        day_df = window_bars(minute_df, start_date, end_date)
     
     if day_df.empty:
         print(f"No data available for {ticker} in the specified date range")
         return daily_df, day_df
     
-    # Calculate cumulative volume for each day
-    day_df = day_df.copy()
-    day_df['cumulative_volume'] = day_df.groupby(day_df['plot_date'].dt.date)['volume'].cumsum()
-    
+    _plot_window(ticker, day_df, target_datetime, display_date, time, combined_plot)
+    return daily_df, day_df
+
+@traced("analysis.plot")
+def _plot_window(ticker, day_df, target_datetime, display_date, time, combined_plot):
     if combined_plot:
         # Create combined plot with two y-axes
         fig, ax1 = plt.subplots(figsize=(16, 8))
@@ -194,7 +227,6 @@ def analyse_stock(ticker, date, time, target_date=None, combined_plot=True):
         plt.tight_layout()
         plt.show()
     
-    return daily_df, day_df
 
 def get_ticker_info(ticker):
     """
@@ -231,4 +263,4 @@ if __name__ == "__main__":
     date = "2025-07-04"
     time = "09:30"
     if ticker:
-        analyse_stock(ticker, date, time, target_date="2025-07-07", combined_plot=True)
+        analyse_stock(ticker, date, time, target_date="2025-07-07", combined_plot=True, cache=BarCache())
@@ -0,0 +1,177 @@
+import os
+import itertools
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from data import download_bars, epoch_ns
+from cache import BarCache, DEFAULT_CACHE_DIR
+from spikes import load_posts
+
+
+def _first_touch(mask, start):
+    """Index of the first True at or after start in each row of mask, len(row) when there is none."""
+    mask = np.atleast_2d(mask).copy()
+    mask[:, :start] = False
+    hit = mask.any(axis=1)
+    return np.where(hit, mask.argmax(axis=1), mask.shape[1])
+
+
+def backtest_alert(minute_df, posted, entry, stop, take_profits=(0.1, 0.2, 0.3), max_holds=(60, 390, 1950),
+                   fill_window=390):
+    """
+    Simulate one alert over a grid of take-profit and time-exit settings.
+
+    A buy limit at `entry` fills on the first bar after the post whose low
+    touches it, at the bar's open if it opened below the entry. After the
+    fill the trade exits on the first bar that hits the stop or the take
+    profit, or at the close after max_hold bars. When the stop and the take
+    profit are hit in the same bar the stop is assumed to come first.
+
+    Parameters:
+    minute_df (DataFrame): Minute bars covering the post and the holding period
+    posted (Timestamp): Tz-aware post time
+    entry (float): Entry price from the alert
+    stop (float): Stop-loss price from the alert
+    take_profits (tuple): Take-profit levels as returns over the fill price
+    max_holds (tuple): Time exits in bars after the fill
+    fill_window (int): Bars after the post the entry has to fill in
+
+    Returns:
+    list: One dict per (take_profit, max_hold) pair
+    """
+    grid = list(itertools.product(take_profits, max_holds))
+    empty = [{"take_profit": tp, "max_hold": hold, "filled": False} for tp, hold in grid]
+    if minute_df.empty:
+        return empty
+
+    minute_df = minute_df.sort_values("date")
+    times = epoch_ns(minute_df["date"])
+    open_ = minute_df["open"].to_numpy(dtype=np.float64)
+    high = minute_df["high"].to_numpy(dtype=np.float64)
+    low = minute_df["low"].to_numpy(dtype=np.float64)
+    close = minute_df["close"].to_numpy(dtype=np.float64)
+    n = len(times)
+
+    post_idx = np.searchsorted(times, pd.Timestamp(posted).value, side="left")
+    fill_idx = _first_touch(low <= entry, post_idx)[0]
+    if fill_idx >= min(n, post_idx + fill_window):
+        return empty
+    fill_price = min(open_[fill_idx], entry)
+
+    # Stops can trigger on the fill bar only if the bar opened below the entry
+    stop_start = fill_idx if open_[fill_idx] < entry else fill_idx + 1
+    stop_idx = _first_touch(low <= stop, stop_start)[0]
+
+    tp_levels = fill_price * (1 + np.asarray(take_profits, dtype=np.float64))
+    tp_idx = _first_touch(high[None, :] >= tp_levels[:, None], fill_idx + 1)
+    time_idx = np.minimum(fill_idx + np.asarray(max_holds), n - 1)
+
+    results = []
+    for (i, tp), (j, hold) in itertools.product(enumerate(take_profits), enumerate(max_holds)):
+        exits = {"stop": stop_idx, "take_profit": tp_idx[i], "time": time_idx[j]}
+        # Ties go to the stop, then the take profit
+        reason = min(exits, key=lambda key: (exits[key], ["stop", "take_profit", "time"].index(key)))
+        exit_idx = exits[reason]
+        if reason == "stop":
+            exit_price = min(open_[exit_idx], stop)
+        elif reason == "take_profit":
+            exit_price = max(open_[exit_idx], tp_levels[i])
+        else:
+            exit_price = close[exit_idx]
+        results.append({
+            "take_profit": tp,
+            "max_hold": hold,
+            "filled": True,
+            "fill_time": pd.Timestamp(times[fill_idx], tz="UTC"),
+            "fill_price": fill_price,
+            "exit_reason": reason,
+            "exit_price": exit_price,
+            "pnl_pct": exit_price / fill_price - 1,
+            "minutes_in_trade": (times[exit_idx] - times[fill_idx]) / 60e9,
+        })
+    return results
+
+
+def _backtest_ticker(args):
+    ticker, ticker_posts, cache_dir, hold_days, kwargs = args
+    cache = BarCache(cache_dir) if cache_dir else None
+    rows = []
+    for post in ticker_posts.itertuples(index=False):
+        base = {"Ticker": ticker, "Date": post.Date, "GMT": post.GMT, "entry": post.Entry, "stop": post.SL}
+        if pd.isna(post.Entry) or pd.isna(post.SL):
+            rows.append({**base, "status": "no levels"})
+            continue
+        if pd.isna(post.posted):
+            rows.append({**base, "status": "bad timestamp"})
+            continue
+        start = post.posted.strftime('%Y-%m-%d')
+        end = (post.posted + timedelta(days=hold_days + 1)).strftime('%Y-%m-%d')
+        try:
+            if cache is not None:
+                minute_df = cache.get_bars(ticker, "1m", start, end)
+            else:
+                minute_df = download_bars(ticker, start, end, "1m")
+        except Exception as e:
+            rows.append({**base, "status": f"error: {e!r}"})
+            continue
+        if minute_df.empty:
+            rows.append({**base, "status": "no data"})
+            continue
+        for result in backtest_alert(minute_df, post.posted, post.Entry, post.SL, **kwargs):
+            rows.append({**base, "status": "ok", **result})
+    return rows
+
+
+def backtest_posts(posts, cache_dir=DEFAULT_CACHE_DIR, processes=None, hold_days=7, **kwargs):
+    """
+    Backtest every alert with Entry and SL levels, one worker process per ticker group.
+
+    Parameters:
+    posts (DataFrame): Posts from spikes.load_posts
+    cache_dir (str): BarCache directory to fetch minute bars through, None to download directly
+    processes (int): Number of worker processes, defaults to the CPU count
+    hold_days (int): Calendar days of minute bars fetched after each post
+    **kwargs: Passed on to backtest_alert (take_profits, max_holds, fill_window)
+
+    Returns:
+    DataFrame: One row per alert and parameter pair
+    """
+    jobs = [(ticker, group, cache_dir, hold_days, kwargs) for ticker, group in posts.groupby("Ticker", sort=False)]
+    rows = []
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        for ticker_rows in pool.map(_backtest_ticker, jobs):
+            rows.extend(ticker_rows)
+    return pd.DataFrame(rows)
+
+
+def summarise_trades(trades):
+    """
+    P&L, hit rate and time in trade per (take_profit, max_hold) pair.
+
+    Returns:
+    DataFrame: One row per parameter pair
+    """
+    ok = trades[trades["status"] == "ok"]
+    if ok.empty:
+        return pd.DataFrame()
+    filled = ok[ok["filled"].astype(bool)]
+    summary = ok.groupby(["take_profit", "max_hold"]).agg(alerts=("Ticker", "size"))
+    summary["trades"] = filled.groupby(["take_profit", "max_hold"]).size()
+    grouped = filled.groupby(["take_profit", "max_hold"])
+    summary["fill_rate"] = summary["trades"] / summary["alerts"]
+    summary["hit_rate"] = grouped["pnl_pct"].apply(lambda pnl: (pnl > 0).mean())
+    summary["mean_pnl_pct"] = grouped["pnl_pct"].mean()
+    summary["total_pnl_pct"] = grouped["pnl_pct"].sum()
+    summary["stop_rate"] = grouped["exit_reason"].apply(lambda reason: (reason == "stop").mean())
+    summary["mean_minutes_in_trade"] = grouped["minutes_in_trade"].mean()
+    return summary.fillna({"trades": 0}).reset_index()
+
+
+if __name__ == "__main__":
+    posts = load_posts('discord_tickers.csv')
+    trades = backtest_posts(posts)
+    trades.to_csv('backtest_trades.csv', index=False)
+    summary = summarise_trades(trades)
+    summary.to_csv('backtest_summary.csv', index=False)
+    print(summary.to_string(index=False))
@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+from data import BAR_COLUMNS, EXCHANGE_TZ, epoch_ns
+
+# 48 bytes per bar: int64 epoch ns timestamps, float32 prices, int64 counts
+BAR_DTYPE = np.dtype([
+    ("date", np.int64),
+    ("open", np.float32),
+    ("high", np.float32),
+    ("low", np.float32),
+    ("close", np.float32),
+    ("volume", np.int64),
+    ("averageWAP", np.float32),
+    ("barCount", np.int64),
+    ("sessionVWAP", np.float32),
+])
+
+
+class Bars:
+    """
+    Compact, typed bar container backed by a NumPy structured array.
+
+    Timestamps are int64 nanoseconds since the epoch (UTC) sorted ascending,
+    and the exchange timezone is kept once on the container rather than on
+    every timestamp. Missing averageWAP/sessionVWAP is NaN, missing barCount is 0.
+    """
+
+    def __init__(self, data, tz=EXCHANGE_TZ):
+        """
+        Parameters:
+        data (ndarray): Structured array with BAR_DTYPE, sorted by date
+        tz (str): Exchange timezone of the bars
+        """
+        self.data = data
+        self.tz = tz
+
+    @classmethod
+    def from_frame(cls, df, tz=EXCHANGE_TZ):
+        """Build from a frame in the fetch_yfinance_data schema."""
+        data = np.empty(len(df), dtype=BAR_DTYPE)
+        if len(df):
+            data["date"] = epoch_ns(pd.to_datetime(df["date"]))
+            for column in ("open", "high", "low", "close"):
+                data[column] = df[column].to_numpy(dtype=np.float32)
+            data["volume"] = df["volume"].fillna(0).to_numpy(dtype=np.int64)
+            for column in ("averageWAP", "sessionVWAP"):
+                data[column] = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+            data["barCount"] = pd.to_numeric(df["barCount"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+            data.sort(order="date", kind="stable")
+        return cls(data, tz)
+
+    @classmethod
+    def concat(cls, parts):
+        parts = list(parts)
+        data = np.concatenate([part.data for part in parts]) if parts else np.empty(0, dtype=BAR_DTYPE)
+        data.sort(order="date", kind="stable")
+        return cls(data, parts[0].tz if parts else EXCHANGE_TZ)
+
+    def to_frame(self):
+        """Expand back into the fetch_yfinance_data DataFrame schema."""
+        df = pd.DataFrame({column: self.data[column] for column in BAR_COLUMNS})
+        df["date"] = pd.to_datetime(self.data["date"], unit="ns", utc=True).tz_convert(self.tz)
+        return df
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.data[key]
+        return Bars(self.data[key], self.tz)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    @property
+    def empty(self):
+        return len(self.data) == 0
+
+    def between(self, start, end):
+        """
+        Zero-copy view of the bars with start <= date < end.
+
+        Parameters:
+        start: Timestamp, or a date interpreted in the exchange timezone
+        end: Timestamp, or a date interpreted in the exchange timezone
+        """
+        lo, hi = np.searchsorted(self.data["date"], [self._ns(start), self._ns(end)], side="left")
+        return Bars(self.data[lo:hi], self.tz)
+
+    def _ns(self, value):
+        ts = pd.Timestamp(value)
+        if ts.tz is None:
+            ts = ts.tz_localize(self.tz)
+        return ts.value
+
+    def local_dates(self):
+        """Exchange-timezone timestamps as a tz-naive DatetimeIndex, for plotting."""
+        return pd.to_datetime(self.data["date"], unit="ns", utc=True).tz_convert(self.tz).tz_localize(None)
+
+    def around(self, at, days_before=1, days_after=1):
+        """
+        Zero-copy view of the whole sessions from days_before days before the
+        exchange-timezone day of `at` to days_after days after it.
+        """
+        ts = pd.Timestamp(at)
+        day = (ts.tz_convert(self.tz) if ts.tz is not None else ts).normalize().tz_localize(None)
+        return self.between(day - pd.Timedelta(days=days_before), day + pd.Timedelta(days=days_after + 1))
+
+    def _day_bounds(self, days, start_time, end_time):
+        # Localise every day separately so the bounds follow DST changes
+        days = pd.DatetimeIndex(days).normalize()
+        starts = (days + pd.Timedelta(start_time)).tz_localize(self.tz).asi8
+        ends = (days + pd.Timedelta(end_time)).tz_localize(self.tz).asi8
+        return np.searchsorted(self.data["date"], starts), np.searchsorted(self.data["date"], ends)
+
+    def time_of_day(self, start_time, end_time, days=None):
+        """
+        The same time-of-day window on several days, e.g. 09:30 - 10:00 every day.
+
+        Parameters:
+        start_time (str): Window start in exchange time, e.g. '09:30'
+        end_time (str): Window end (exclusive) in exchange time
+        days (list): Days to take the window from, defaults to every day with bars
+
+        Returns:
+        dict: Day (Timestamp) -> zero-copy Bars view, days with no bars in the window are left out
+        """
+        if self.empty:
+            return {}
+        if days is None:
+            first, last = (pd.Timestamp(self.data["date"][i], tz="UTC").tz_convert(self.tz) for i in (0, -1))
+            days = pd.date_range(first.tz_localize(None).normalize(), last.tz_localize(None).normalize())
+        days = pd.DatetimeIndex(days)
+        lo, hi = self._day_bounds(days, f"{start_time}:00"[:8], f"{end_time}:00"[:8])
+        return {day: Bars(self.data[a:b], self.tz) for day, a, b in zip(days.normalize(), lo, hi) if b > a}
+
+
+class BarStore:
+    """
+    Minute bars of several tickers, each indexed by its sorted int64
+    timestamps, so windows are binary searches returning zero-copy views
+    instead of refetching and filtering.
+
+    Covers the two comparison views from the README: the same stock at
+    different times (time_of_day, around) and different stocks at the same
+    time (at).
+    """
+
+    def __init__(self, bars=None):
+        """
+        Parameters:
+        bars (dict): Ticker -> Bars
+        """
+        self.bars = dict(bars or {})
+
+    @classmethod
+    def from_frames(cls, frames, tz=EXCHANGE_TZ):
+        """Build from ticker -> bars DataFrame."""
+        return cls({ticker: Bars.from_frame(df, tz) for ticker, df in frames.items()})
+
+    def add(self, ticker, bars):
+        """Add or extend a ticker's bars, keeping them sorted and unique by timestamp."""
+        if isinstance(bars, pd.DataFrame):
+            bars = Bars.from_frame(bars)
+        if ticker in self.bars:
+            merged = Bars.concat([self.bars[ticker], bars])
+            keep = np.r_[np.diff(merged.data["date"]) != 0, True]
+            bars = merged[keep]
+        self.bars[ticker] = bars
+
+    def __getitem__(self, ticker):
+        return self.bars[ticker]
+
+    def __contains__(self, ticker):
+        return ticker in self.bars
+
+    def tickers(self):
+        return list(self.bars)
+
+    def between(self, ticker, start, end):
+        return self.bars[ticker].between(start, end)
+
+    def around(self, ticker, at, days_before=1, days_after=1):
+        """The sessions days_before to days_after around a time, e.g. a Discord post."""
+        return self.bars[ticker].around(at, days_before, days_after)
+
+    def time_of_day(self, ticker, start_time, end_time, days=None):
+        return self.bars[ticker].time_of_day(start_time, end_time, days)
+
+    def at(self, start, end, tickers=None):
+        """
+        Different stocks over the same window.
+
+        Returns:
+        dict: Ticker -> zero-copy Bars view with start <= date < end, tickers
+            without bars in the window are left out
+        """
+        views = {ticker: self.bars[ticker].between(start, end) for ticker in (tickers or self.bars)}
+        return {ticker: view for ticker, view in views.items() if not view.empty}
+
+    def aligned(self, column, start, end, tickers=None):
+        """
+        One column of several tickers over the same window as a ticker x time
+        matrix on the union of their timestamps, NaN where a ticker has no bar.
+
+        Returns:
+        tuple: (tickers, int64 epoch ns timestamps, matrix)
+        """
+        views = self.at(start, end, tickers)
+        names = list(views)
+        if not names:
+            return [], np.empty(0, dtype=np.int64), np.empty((0, 0))
+        times = np.unique(np.concatenate([view.data["date"] for view in views.values()]))
+        matrix = np.full((len(names), len(times)), np.nan)
+        for i, view in enumerate(views.values()):
+            matrix[i, np.searchsorted(times, view.data["date"])] = view.data[column]
+        return names, times, matrix
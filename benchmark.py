@@ -0,0 +1,261 @@
+import gc
+import json
+import time
+import zlib
+import platform
+import subprocess
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from data import add_bar_stats, BAR_COLUMNS, EXCHANGE_TZ
+
+# Extended hours session served by yfinance with prepost=True, 04:00 - 20:00 ET
+SESSION_START_MINUTE = 4 * 60
+SESSION_MINUTES = 16 * 60
+
+# name -> (tickers, days of minute bars, days of daily bars)
+SCALES = {
+    "1x5d": (1, 5, 252),
+    "100x5d": (100, 5, 252),
+    "1000x5d": (1000, 5, 252),
+    "1x60d": (1, 60, 252),
+    "10x120d": (10, 120, 252),
+}
+DEFAULT_SCALES = ["1x5d", "100x5d", "1000x5d", "1x60d"]
+
+
+def _rng(ticker, seed):
+    # Same bars for the same ticker and seed on every machine and run
+    return np.random.default_rng([seed, zlib.crc32(ticker.encode())])
+
+
+def _ohlcv(rng, dates, start_price, sigma, mean_volume):
+    n = len(dates)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, sigma, n)))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    wick = np.abs(rng.normal(0, sigma, (2, n)))
+    volume = rng.lognormal(np.log(mean_volume), 1.0, n).astype(np.int64)
+    # Roughly a third of the bars are empty, like thin pre and post market minutes
+    volume[rng.random(n) < 0.3] = 0
+    return pd.DataFrame({
+        "date": dates,
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + wick[0]),
+        "low": np.minimum(open_, close) * (1 - wick[1]),
+        "close": close,
+        "volume": volume,
+    })
+
+
+def synthetic_bars(ticker, end, days, interval, seed=0, exchange_tz=EXCHANGE_TZ):
+    """
+    Deterministic random-walk bars in the fetch_yfinance_data schema.
+
+    Parameters:
+    ticker (str): Ticker the bars are for, part of the random seed
+    end (str): End date in format 'YYYY-MM-DD' (exclusive)
+    days (int): Number of trading days (weekdays) before end
+    interval (str): '1d' or '1m', minute bars cover the 04:00 - 20:00 session
+    seed (int): Seed shared by every ticker
+
+    Returns:
+    DataFrame: Bars with BAR_COLUMNS
+    """
+    rng = _rng(f"{ticker}/{interval}", seed)
+    sessions = pd.bdate_range(end=pd.Timestamp(end) - timedelta(days=1), periods=days)
+    if interval == "1d":
+        dates = sessions.tz_localize(exchange_tz)
+        df = _ohlcv(rng, dates, rng.uniform(1, 20), 0.05, 5e6)
+    elif interval == "1m":
+        minutes = pd.to_timedelta(np.arange(SESSION_START_MINUTE, SESSION_START_MINUTE + SESSION_MINUTES), unit="min")
+        local = (sessions.to_numpy()[:, None] + minutes.to_numpy()[None, :]).ravel()
+        dates = pd.DatetimeIndex(local).tz_localize(exchange_tz)
+        df = _ohlcv(rng, dates, rng.uniform(1, 20), 0.002, 5e3)
+    else:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return add_bar_stats(df, interval, exchange_tz)[BAR_COLUMNS]
+
+
+def synthetic_watchlist(n_tickers, end, minute_days=5, daily_days=252, seed=0):
+    """Ticker -> (daily_df, minute_df) for n_tickers synthetic tickers named SYN0, SYN1, ..."""
+    return {f"SYN{i}": (synthetic_bars(f"SYN{i}", end, daily_days, "1d", seed),
+                        synthetic_bars(f"SYN{i}", end, minute_days, "1m", seed))
+            for i in range(n_tickers)}
+
+
+def synthetic_discord_lines(n_posts, end, seed=0):
+    """Lines of a Discord export with n_posts alerts, in the format discord.py parses."""
+    rng = np.random.default_rng(seed)
+    posted = pd.Timestamp(end) - pd.to_timedelta(np.arange(n_posts)[::-1], unit="D") + timedelta(hours=13)
+    lines = ["Tickers\n", "\n"]
+    for i, when in enumerate(posted):
+        entry = round(float(rng.uniform(1, 10)), 2)
+        lines += [
+            f"Ticker: SYN{rng.integers(0, max(n_posts // 3, 1))}\n",
+            f"Entry: Anything under ${entry:.2f} is still GOOD\n",
+            f"S/L: Under ${entry * 0.8:.2f}\n",
+            "Nice setup bouncing off the trendline on the 1h time frame here!\n",
+            "\n",
+            "Technical levels are displayed on the chart.\n",
+            "\n",
+            "@everyone\n",
+            "Image\n",
+            "tyrone lopez\n",
+            "[CASH]\n",
+            f" — {when.strftime('%d/%m/%Y %H:%M')}\n",
+        ]
+    return lines
+
+
+def measure(fn, repeat=3):
+    """
+    Time fn over repeat runs, then run it once more under tracemalloc for the
+    peak memory it allocates.
+
+    Returns:
+    dict: seconds_min, seconds_median and peak_mb
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds_min": min(times), "seconds_median": float(np.median(times)), "peak_mb": peak / 2 ** 20}
+
+
+def benchmark_scale(name, end, seed=0, repeat=3):
+    """
+    Run every benchmark at one scale.
+
+    Returns:
+    list: One result dict per benchmark
+    """
+    from trends import compute_price_trends, compute_volume_trends, periods
+    from analysis import window_bars
+    from discord import parse_posts, posts_to_frame
+    from bars import Bars
+
+    n_tickers, minute_days, daily_days = SCALES[name]
+    watchlist = synthetic_watchlist(n_tickers, end, minute_days, daily_days, seed)
+    compact = {ticker: (Bars.from_frame(daily_df), Bars.from_frame(minute_df))
+               for ticker, (daily_df, minute_df) in watchlist.items()}
+    lines = synthetic_discord_lines(n_tickers * 10, end, seed)
+    minute_rows = sum(len(minute_df) for _, minute_df in watchlist.values())
+
+    # analyse_stock plots the day before to the day after the post
+    end_date = (pd.Timestamp(end) - timedelta(days=1)).date()
+    start_date = end_date - timedelta(days=2)
+
+    def trends(fn, frames):
+        return lambda: [fn(daily_df, minute_df, periods) for daily_df, minute_df in frames.values()]
+
+    def windows(frames):
+        return lambda: [window_bars(minute_df, start_date, end_date) for _, minute_df in frames.values()]
+
+    benchmarks = {
+        "compute_price_trends": (trends(compute_price_trends, watchlist), minute_rows),
+        "compute_volume_trends": (trends(compute_volume_trends, watchlist), minute_rows),
+        "compute_price_trends_compact": (trends(compute_price_trends, compact), minute_rows),
+        "window_bars": (windows(watchlist), minute_rows),
+        "window_bars_compact": (windows(compact), minute_rows),
+        "discord_parse": (lambda: posts_to_frame(list(parse_posts(lines))), len(lines)),
+    }
+    results = []
+    for bench_name, (fn, rows) in benchmarks.items():
+        result = {"benchmark": bench_name, "scale": name, "tickers": n_tickers, "minute_days": minute_days,
+                  "rows": rows, **measure(fn, repeat)}
+        result["rows_per_second"] = rows / result["seconds_min"] if result["seconds_min"] else None
+        results.append(result)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales=DEFAULT_SCALES, end="2025-06-21", seed=0, repeat=3):
+    """
+    Run the benchmarks at every scale.
+
+    Returns:
+    dict: Run metadata under 'meta' and the result dicts under 'results'
+    """
+    results = []
+    for name in scales:
+        results.extend(benchmark_scale(name, end, seed, repeat))
+    return {
+        "meta": {
+            "timestamp": pd.Timestamp.now(tz="UTC").isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "end": end,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=0.2):
+    """
+    Benchmarks that got slower or used more memory than the baseline by more
+    than tolerance (0.2 = 20%).
+
+    Returns:
+    DataFrame: One row per regression
+    """
+    key = ["benchmark", "scale"]
+    now = pd.DataFrame(current["results"]).set_index(key)
+    before = pd.DataFrame(baseline["results"]).set_index(key)
+    joined = now.join(before, rsuffix="_baseline", how="inner")
+    rows = []
+    for metric in ("seconds_min", "peak_mb"):
+        ratio = joined[metric] / joined[f"{metric}_baseline"]
+        for (bench_name, scale), value in ratio[ratio > 1 + tolerance].items():
+            rows.append({"benchmark": bench_name, "scale": scale, "metric": metric,
+                         "baseline": joined.loc[(bench_name, scale), f"{metric}_baseline"],
+                         "current": joined.loc[(bench_name, scale), metric], "ratio": value})
+    return pd.DataFrame(rows, columns=["benchmark", "scale", "metric", "baseline", "current", "ratio"])
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Benchmark the trend, window and Discord parsing paths on synthetic bars")
+    parser.add_argument("--scales", nargs="*", default=DEFAULT_SCALES, choices=list(SCALES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = run(args.scales, seed=args.seed, repeat=args.repeat)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(pd.DataFrame(report["results"])[["benchmark", "scale", "rows", "seconds_min", "peak_mb"]].to_string(index=False))
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if not regressions.empty:
+            print("\nRegressions:")
+            print(regressions.to_string(index=False))
+            sys.exit(1)
+        print("\nNo regressions")
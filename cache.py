@@ -0,0 +1,267 @@
+import os
+import json
+import pandas as pd
+from datetime import timedelta
+from data import download_bars, resample_bars, empty_bars, BAR_COLUMNS, EXCHANGE_TZ, RESAMPLE_RULES
+from instrument import span, count
+
+DEFAULT_CACHE_DIR = ".bar_cache"
+
+# Partition key format per interval: minute bars get one file per day,
+# daily bars one file per year
+PARTITION_FORMATS = {
+    "1m": "%Y-%m-%d",
+    "1d": "%Y",
+}
+
+# yfinance only serves 1m bars for the last ~30 days and at most 7 days per request
+MINUTE_HISTORY_DAYS = 29
+MINUTE_CHUNK_DAYS = 7
+
+
+def _partition_bounds(name):
+    """
+    Return the (start, end) dates covered by a partition file name.
+    Day partitions look like '2025-06-18', month (compacted) partitions
+    like '2025-06' and year partitions like '2025'.
+    """
+    start = pd.Timestamp(name)
+    if len(name) == 10:
+        end = start + pd.DateOffset(days=1)
+    elif len(name) == 7:
+        end = start + pd.DateOffset(months=1)
+    else:
+        end = start + pd.DateOffset(years=1)
+    return start.date(), end.date()
+
+
+def _group_ranges(days):
+    """Group a sorted list of dates into (start, end) ranges with an exclusive end."""
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [(start, end) for start, end in ranges]
+
+
+class BarCache:
+    """
+    Persistent on-disk bar store in front of yfinance.
+
+    Bars are stored as Parquet files under root/interval/TICKER/partition.parquet
+    next to a coverage.json manifest listing every day that has already been
+    downloaded. Repeat requests are served from disk and only the missing days
+    are downloaded.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, downloader=download_bars, exchange_tz=EXCHANGE_TZ):
+        """
+        Parameters:
+        root (str): Directory the store lives in
+        downloader (callable): Function (ticker, start, end, interval) -> bars frame
+        exchange_tz (str): Timezone used to assign bars to day partitions
+        """
+        self.root = root
+        self.downloader = downloader
+        self.exchange_tz = exchange_tz
+        self.stats = {"hits": 0, "misses": 0, "rows_downloaded": 0}
+
+    def _ticker_dir(self, ticker, interval):
+        return os.path.join(self.root, interval, ticker.upper())
+
+    def _load_coverage(self, ticker, interval):
+        path = os.path.join(self._ticker_dir(ticker, interval), "coverage.json")
+        if not os.path.exists(path):
+            return set()
+        with open(path, "r") as f:
+            return set(json.load(f))
+
+    def _save_coverage(self, ticker, interval, covered):
+        directory = self._ticker_dir(ticker, interval)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "coverage.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(sorted(covered), f)
+        os.replace(tmp_path, path)
+
+    def _partitions(self, ticker, interval):
+        directory = self._ticker_dir(ticker, interval)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len(".parquet")] for name in os.listdir(directory) if name.endswith(".parquet"))
+
+    def _write_partition(self, ticker, interval, name, df):
+        directory = self._ticker_dir(ticker, interval)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.parquet")
+        if os.path.exists(path):
+            df = pd.concat([pd.read_parquet(path), df], ignore_index=True)
+        df = df.drop_duplicates(subset="date", keep="last").sort_values("date")
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def _today(self):
+        return pd.Timestamp.now(tz=self.exchange_tz).date()
+
+    def _store(self, ticker, interval, df):
+        if df.empty:
+            return
+        keys = df["date"].dt.tz_convert(self.exchange_tz).dt.strftime(PARTITION_FORMATS[interval])
+        for name, part in df.groupby(keys):
+            self._write_partition(ticker, interval, name, part)
+
+    def _download_missing(self, ticker, interval, missing):
+        """Download every missing range and return the days that are now covered."""
+        today = self._today()
+        if interval == "1m":
+            oldest = today - timedelta(days=MINUTE_HISTORY_DAYS)
+            missing = [day for day in missing if day >= oldest]
+
+        fetched = []
+        for start, end in _group_ranges(missing):
+            chunk_days = MINUTE_CHUNK_DAYS if interval == "1m" else (end - start).days
+            chunk_start = start
+            while chunk_start < end:
+                chunk_end = min(chunk_start + timedelta(days=chunk_days), end)
+                df = self.downloader(ticker, str(chunk_start), str(chunk_end), interval)
+                self.stats["misses"] += 1
+                self.stats["rows_downloaded"] += len(df)
+                count("cache.misses")
+                self._store(ticker, interval, df)
+                days = [chunk_start + timedelta(days=i) for i in range((chunk_end - chunk_start).days)]
+                # yfinance returns an empty frame instead of raising when a request fails,
+                # so an empty chunk only covers its weekend days and the rest is retried
+                fetched.extend(days if not df.empty else [day for day in days if day.weekday() >= 5])
+                chunk_start = chunk_end
+
+        # Today's bars are still coming in, so never mark today as complete
+        return [day for day in fetched if day < today]
+
+    def get_bars(self, ticker, interval, start, end):
+        """
+        Return the bars for a ticker between start (inclusive) and end (exclusive),
+        downloading only the days that are not in the store yet.
+
+        Parameters:
+        ticker (str): The stock ticker symbol
+        interval (str): '1d', '1m', or one of RESAMPLE_RULES which is built from the 1m bars
+        start (str): Start date in format 'YYYY-MM-DD'
+        end (str): End date in format 'YYYY-MM-DD'
+
+        Returns:
+        DataFrame: Bars with BAR_COLUMNS
+        """
+        if interval in RESAMPLE_RULES:
+            return resample_bars(self.get_bars(ticker, "1m", start, end), interval, self.exchange_tz)
+        if interval not in PARTITION_FORMATS:
+            raise ValueError(f"Unsupported interval: {interval}")
+        start = pd.to_datetime(start).date()
+        end = pd.to_datetime(end).date()
+
+        covered = self._load_coverage(ticker, interval)
+        requested = [start + timedelta(days=i) for i in range((end - start).days)]
+        missing = [day for day in requested if str(day) not in covered]
+
+        misses = self.stats["misses"]
+        if missing:
+            newly_covered = self._download_missing(ticker, interval, missing)
+            if newly_covered:
+                covered.update(str(day) for day in newly_covered)
+                self._save_coverage(ticker, interval, covered)
+        if self.stats["misses"] == misses:
+            self.stats["hits"] += 1
+            count("cache.hits")
+
+        with span("cache.read", ticker=ticker, interval=interval):
+            return self.read(ticker, interval, start, end)
+
+    def read(self, ticker, interval, start, end):
+        """Read stored bars between start and end without touching the network."""
+        start = pd.to_datetime(start).date()
+        end = pd.to_datetime(end).date()
+        frames = []
+        for name in self._partitions(ticker, interval):
+            part_start, part_end = _partition_bounds(name)
+            if part_start < end and part_end > start:
+                path = os.path.join(self._ticker_dir(ticker, interval), f"{name}.parquet")
+                frames.append(pd.read_parquet(path))
+
+        if not frames:
+            return empty_bars(self.exchange_tz)
+
+        df = pd.concat(frames, ignore_index=True)
+        bar_day = df["date"].dt.tz_convert(self.exchange_tz).dt.date
+        df = df[(bar_day >= start) & (bar_day < end)]
+        return df.sort_values("date").reset_index(drop=True).reindex(columns=BAR_COLUMNS)
+
+    def compact(self, ticker=None, interval="1m"):
+        """
+        Merge the day partitions of finished months into one file per month
+        so old minute history does not end up as thousands of small files.
+        """
+        tickers = [ticker] if ticker else self.tickers(interval)
+        current_month = self._today().strftime("%Y-%m")
+        for tk in tickers:
+            directory = self._ticker_dir(tk, interval)
+            by_month = {}
+            for name in self._partitions(tk, interval):
+                if len(name) == 10 and name[:7] != current_month:
+                    by_month.setdefault(name[:7], []).append(name)
+            for month, names in by_month.items():
+                paths = [os.path.join(directory, f"{name}.parquet") for name in names]
+                df = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+                self._write_partition(tk, interval, month, df)
+                for path in paths:
+                    os.remove(path)
+
+    def evict(self, max_age_days=None, max_bytes=None, interval="1m"):
+        """
+        Drop old partitions. Partitions that end more than max_age_days ago are
+        removed first, then the oldest partitions across all tickers are removed
+        until the store is under max_bytes. Evicted days are taken out of the
+        coverage manifest so they are downloaded again if requested.
+        """
+        entries = []
+        for tk in self.tickers(interval):
+            directory = self._ticker_dir(tk, interval)
+            for name in self._partitions(tk, interval):
+                path = os.path.join(directory, f"{name}.parquet")
+                entries.append((_partition_bounds(name), tk, path))
+        entries.sort()
+
+        evicted = []
+        if max_age_days is not None:
+            cutoff = self._today() - timedelta(days=max_age_days)
+            evicted = [entry for entry in entries if entry[0][1] <= cutoff]
+            entries = [entry for entry in entries if entry[0][1] > cutoff]
+
+        if max_bytes is not None:
+            total = sum(os.path.getsize(path) for _, _, path in entries)
+            while entries and total > max_bytes:
+                entry = entries.pop(0)
+                total -= os.path.getsize(entry[2])
+                evicted.append(entry)
+
+        for (part_start, part_end), tk, path in evicted:
+            os.remove(path)
+            covered = self._load_coverage(tk, interval)
+            days = {str(part_start + timedelta(days=i)) for i in range((part_end - part_start).days)}
+            self._save_coverage(tk, interval, covered - days)
+
+        return len(evicted)
+
+    def tickers(self, interval):
+        directory = os.path.join(self.root, interval)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(os.listdir(directory))
+
+    def size_bytes(self):
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+        return total
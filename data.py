@@ -1,78 +1,426 @@
+import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+import time
 import warnings
+from instrument import span, count
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
-def fetch_yfinance_data(ticker, end, start=None):
-    exchange_tz = "America/New_York"  # Adjust if you want to support other exchanges
+EXCHANGE_TZ = "America/New_York"  # Adjust if you want to support other exchanges
+BAR_COLUMNS = ["date", "open", "high", "low", "close", "volume", "averageWAP", "barCount", "sessionVWAP"]
 
-    if start is None:
-        end_dt = pd.to_datetime(end)
-        start = (end_dt - timedelta(days=365)).strftime('%Y-%m-%d')
-    
-    # Fetch daily data
-    daily_df = yf.download(ticker, start=start, end=end, interval="1d", auto_adjust=True)
-    daily_df = daily_df.rename(columns={
+# Intervals that are built from cached 1m bars instead of being downloaded
+RESAMPLE_RULES = {"5m": "5min", "15m": "15min", "30m": "30min", "1h": "1h"}
+
+
+def normalise_bars(df, interval="1d", exchange_tz=EXCHANGE_TZ):
+    """
+    Put a raw yf.download frame into the IKBR bar format.
+
+    Parameters:
+    df (DataFrame): Frame returned by yf.download for a single ticker
+    interval (str): yfinance interval of the bars
+    exchange_tz (str): Timezone the bar timestamps are converted to
+
+    Returns:
+    DataFrame: Bars with BAR_COLUMNS
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    df = df.rename(columns={
         "Open": "open",
         "High": "high",
         "Low": "low",
         "Close": "close",
         "Volume": "volume"
     })
-    if "Adj Close" in daily_df.columns:
-        daily_df = daily_df.drop(columns=["Adj Close"])
-    daily_df.index.name = "date"
-    daily_df = daily_df.reset_index()
-    
-    # Handle timezone for daily data
-    daily_df['date'] = pd.to_datetime(daily_df['date'])
-    if daily_df['date'].dt.tz is None:
-        daily_df['date'] = daily_df['date'].dt.tz_localize(exchange_tz)
+    if "Adj Close" in df.columns:
+        df = df.drop(columns=["Adj Close"])
+    df.index.name = "date"
+    df = df.reset_index()
+
+    # Handle timezone
+    with span("data.timezone", interval=interval):
+        df['date'] = pd.to_datetime(df['date'])
+        if df['date'].dt.tz is None:
+            df['date'] = df['date'].dt.tz_localize(exchange_tz)
+        else:
+            df['date'] = df['date'].dt.tz_convert(exchange_tz)
+
+    with span("data.bar_stats", interval=interval):
+        return add_bar_stats(df, interval, exchange_tz)
+
+
+def add_bar_stats(df, interval, exchange_tz=EXCHANGE_TZ):
+    """
+    Fill in averageWAP, barCount and sessionVWAP, which yfinance does not provide.
+
+    averageWAP is the typical price (high + low + close) / 3 of each bar and
+    sessionVWAP is the volume weighted running average of it since the start of
+    the exchange-timezone day. yfinance has no trade counts, so for minute bars
+    barCount is 1 when the minute traded and 0 otherwise; summed over a longer
+    bar it gives the number of traded minutes. Daily bars get their barCount
+    from the minute data in fill_daily_from_minutes.
+
+    Returns:
+    DataFrame: Bars with BAR_COLUMNS
+    """
+    df = df.copy()
+    typical = (df["high"] + df["low"] + df["close"]) / 3
+    df["averageWAP"] = typical.astype(np.float64)
+    if interval == "1m":
+        df["barCount"] = (df["volume"] > 0).astype(np.int64)
     else:
-        daily_df['date'] = daily_df['date'].dt.tz_convert(exchange_tz)
-        
-    daily_df["averageWAP"] = None
-    daily_df["barCount"] = None
-    daily_df = daily_df[["date", "open", "high", "low", "close", "volume", "averageWAP", "barCount"]]
+        df["barCount"] = pd.array([pd.NA] * len(df), dtype="Int64")
+
+    df["sessionVWAP"] = session_vwap(df, interval, exchange_tz)
+    return df[BAR_COLUMNS]
+
+
+def session_vwap(df, interval, exchange_tz=EXCHANGE_TZ):
+    """
+    Volume weighted running average of averageWAP since the start of each
+    exchange-timezone day. For daily bars this is just the bar's averageWAP.
+    """
+    if interval == "1d":
+        return df["averageWAP"].astype(np.float64)
+    day = df["date"].dt.tz_convert(exchange_tz).dt.date
+    pv = (df["averageWAP"] * df["volume"]).groupby(day).cumsum()
+    cum_volume = df["volume"].groupby(day).cumsum()
+    # Before the first traded bar of the day fall back to the bar's own average
+    return (pv / cum_volume.where(cum_volume > 0)).fillna(df["averageWAP"]).astype(np.float64)
+
+
+def _aggregate(df, keys):
+    pv = df["averageWAP"] * df["volume"]
+    grouped = df.assign(pv=pv).groupby(keys, sort=True)
+    out = grouped.agg(
+        date=("date", "first"),
+        open=("open", "first"),
+        high=("high", "max"),
+        low=("low", "min"),
+        close=("close", "last"),
+        volume=("volume", "sum"),
+        pv=("pv", "sum"),
+        barCount=("barCount", "sum"),
+        sessionVWAP=("sessionVWAP", "last"),
+    )
+    typical = (out["high"] + out["low"] + out["close"]) / 3
+    out["averageWAP"] = (out["pv"] / out["volume"].where(out["volume"] > 0)).fillna(typical)
+    return out.reset_index(drop=True)
+
+
+def resample_bars(minute_df, interval, exchange_tz=EXCHANGE_TZ):
+    """
+    Build coarser bars (5m, 15m, 30m, 1h) from 1m bars.
+
+    Parameters:
+    minute_df (DataFrame): 1m bars with BAR_COLUMNS
+    interval (str): One of RESAMPLE_RULES
+
+    Returns:
+    DataFrame: Bars with BAR_COLUMNS stamped at the start of each interval
+    """
+    if minute_df.empty:
+        return minute_df[BAR_COLUMNS]
+    minute_df = minute_df.sort_values("date")
+    bucket = minute_df["date"].dt.tz_convert(exchange_tz).dt.floor(RESAMPLE_RULES[interval])
+    out = _aggregate(minute_df, bucket)
+    out["date"] = np.sort(bucket.unique())
+    return out[BAR_COLUMNS]
+
+
+def daily_from_minutes(minute_df, exchange_tz=EXCHANGE_TZ):
+    """
+    Aggregate 1m bars into one bar per exchange-timezone day, with the day's
+    VWAP as averageWAP and the number of traded minutes as barCount.
+    """
+    if minute_df.empty:
+        return minute_df[BAR_COLUMNS]
+    minute_df = minute_df.sort_values("date")
+    local = minute_df["date"].dt.tz_convert(exchange_tz)
+    day = local.dt.normalize()
+    out = _aggregate(minute_df, day)
+    out["date"] = np.sort(day.unique())
+    out["sessionVWAP"] = out["averageWAP"]
+    return out[BAR_COLUMNS]
+
+
+def fill_daily_from_minutes(daily_df, minute_df, exchange_tz=EXCHANGE_TZ):
+    """
+    Replace averageWAP, barCount and sessionVWAP of the daily bars with the
+    values derived from the minute bars for every day the minute data covers.
+    """
+    derived = daily_from_minutes(minute_df, exchange_tz)
+    if derived.empty or daily_df.empty:
+        return daily_df
+    daily_df = daily_df.copy()
+    day = daily_df["date"].dt.tz_convert(exchange_tz).dt.date
+    derived = derived.set_index(derived["date"].dt.date)
+    covered = day.isin(derived.index)
+    for column in ("averageWAP", "barCount", "sessionVWAP"):
+        daily_df.loc[covered, column] = derived.loc[day[covered], column].to_numpy()
+    return daily_df
+
+
+def empty_bars(exchange_tz=EXCHANGE_TZ):
+    """A bars frame with no rows, typed like downloaded bars so the date accessors work on it."""
+    dtypes = {"date": f"datetime64[ns, {exchange_tz}]", "volume": "int64", "barCount": "int64"}
+    return pd.DataFrame({column: pd.Series(dtype=dtypes.get(column, "float64")) for column in BAR_COLUMNS})
+
+
+def epoch_ns(dates):
+    """Convert a tz-aware date column to int64 nanoseconds since the epoch (UTC)."""
+    return dates.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy("datetime64[ns]").view(np.int64)
+
+
+def slice_bars(df, start, end, exchange_tz=EXCHANGE_TZ):
+    """
+    Bars with start <= date < end, found with a binary search on the sorted
+    timestamps instead of comparing every row.
+
+    Parameters:
+    df (DataFrame): Bars, sorted by date unless they are sorted here first
+    start: Timestamp, or a date interpreted in the exchange timezone
+    end: Timestamp, or a date interpreted in the exchange timezone
+
+    Returns:
+    DataFrame: A positional slice of df (a view where pandas allows it)
+    """
+    if df.empty:
+        return df.iloc[0:0]
+    if not df["date"].is_monotonic_increasing:
+        df = df.sort_values("date")
+    # asi8 is a view of the stored UTC integers in the column's own unit, so
+    # nothing is converted or copied and the lookup stays O(log n)
+    dates = df["date"].array
+    if not isinstance(dates, pd.arrays.DatetimeArray):
+        dates = pd.to_datetime(df["date"], utc=True).array
+    bounds = []
+    for value in (start, end):
+        ts = pd.Timestamp(value)
+        ts = ts if ts.tz is not None else ts.tz_localize(exchange_tz)
+        # asm8 is the UTC datetime64, in the same unit as the column
+        bounds.append(ts.as_unit(dates.unit).asm8.view(np.int64))
+    lo, hi = np.searchsorted(dates.asi8, bounds, side="left")
+    return df.iloc[lo:hi]
+
+
+def download_bars(ticker, start, end, interval):
+    """
+    Download one range of bars from yfinance.
+
+    Parameters:
+    ticker (str): The stock ticker symbol
+    start (str): Start date in format 'YYYY-MM-DD' (inclusive)
+    end (str): End date in format 'YYYY-MM-DD' (exclusive)
+    interval (str): yfinance interval, e.g. '1d' or '1m'
+
+    Returns:
+    DataFrame: Bars with BAR_COLUMNS
+    """
+    with span("data.yf_download", ticker=ticker, interval=interval):
+        df = yf.download(
+            ticker,
+            start=start,
+            end=end,
+            interval=interval,
+            auto_adjust=True,
+            prepost=interval != "1d"
+        )
+    count("download.requests")
+    count("download.rows", len(df))
+    # In-memory size of the parsed frame, yfinance does not expose the response size
+    count("download.frame_bytes", int(df.memory_usage(index=True).sum()))
+    return normalise_bars(df, interval)
+
+
+def fetch_yfinance_data(ticker, end, start=None, cache=None, compact=False, source=None):
+    """
+    Fetch daily bars (1 year by default) and minute bars (last 6 days) for a ticker.
+
+    Parameters:
+    ticker (str): The stock ticker symbol
+    end (str): End date in format 'YYYY-MM-DD' (exclusive)
+    start (str): Optional start date for the daily bars
+    cache (BarCache): Optional on-disk bar store to serve the request from
+    compact (bool): Return typed Bars containers instead of DataFrames
+    source: Optional bar source with get_bars(ticker, interval, start, end),
+        e.g. a sources.DataRouter, used instead of cache
+
+    Returns:
+    tuple: Daily and minute dataframes (or Bars when compact is set)
+    """
+    if start is None:
+        end_dt = pd.to_datetime(end)
+        start = (end_dt - timedelta(days=365)).strftime('%Y-%m-%d')
 
     # Fetch minute data (max 7 days)
     end_dt = pd.to_datetime(end)
     minute_start = (end_dt - timedelta(days=6)).strftime('%Y-%m-%d')
-    minute_df = yf.download(
-        ticker,
-        start=minute_start,
-        end=end,
-        interval="1m",
-        auto_adjust=True,
-        prepost=True
-    )
-    minute_df = minute_df.rename(columns={
-        "Open": "open",
-        "High": "high",
-        "Low": "low",
-        "Close": "close",
-        "Volume": "volume"
-    })
-    if "Adj Close" in minute_df.columns:
-        minute_df = minute_df.drop(columns=["Adj Close"])
-    minute_df.index.name = "date"
-    minute_df = minute_df.reset_index()
-    
-    # Handle timezone for minute data
-    minute_df['date'] = pd.to_datetime(minute_df['date'])
-    if minute_df['date'].dt.tz is None:
-        minute_df['date'] = minute_df['date'].dt.tz_localize(exchange_tz)
+
+    if source is None:
+        source = cache
+    if source is not None:
+        daily_df = source.get_bars(ticker, "1d", start, end)
+        minute_df = source.get_bars(ticker, "1m", minute_start, end)
     else:
-        minute_df['date'] = minute_df['date'].dt.tz_convert(exchange_tz)
-        
-    minute_df["averageWAP"] = None
-    minute_df["barCount"] = None
-    minute_df = minute_df[["date", "open", "high", "low", "close", "volume", "averageWAP", "barCount"]]
+        daily_df = download_bars(ticker, start, end, "1d")
+        minute_df = download_bars(ticker, minute_start, end, "1m")
 
+    with span("data.fill_daily"):
+        daily_df = fill_daily_from_minutes(daily_df, minute_df)
+
+    if compact:
+        from bars import Bars
+        return Bars.from_frame(daily_df), Bars.from_frame(minute_df)
     return daily_df, minute_df
 
+def download_bars_batch(tickers, start, end, interval):
+    """
+    Download one range of bars for several tickers in a single yfinance request.
+
+    Parameters:
+    tickers (list): Ticker symbols
+    start (str): Start date in format 'YYYY-MM-DD', or a tz-aware Timestamp (inclusive)
+    end (str): End date in format 'YYYY-MM-DD' (exclusive)
+    interval (str): yfinance interval, e.g. '1d' or '1m'
+
+    Returns:
+    dict: Ticker -> bars with BAR_COLUMNS (tickers yfinance returned nothing for are left out)
+    """
+    with span("data.yf_download_batch", tickers=len(tickers), interval=interval):
+        df = yf.download(
+            list(tickers),
+            start=start,
+            end=end,
+            interval=interval,
+            auto_adjust=True,
+            prepost=interval != "1d",
+            group_by="ticker",
+            threads=False
+        )
+    count("download.requests")
+    count("download.rows", len(df))
+    count("download.frame_bytes", int(df.memory_usage(index=True).sum()))
+    bars = {}
+    if df.empty:
+        return bars
+    for ticker in tickers:
+        if isinstance(df.columns, pd.MultiIndex):
+            if ticker not in df.columns.get_level_values(0):
+                continue
+            ticker_df = df[ticker]
+        else:
+            ticker_df = df
+        ticker_df = ticker_df.dropna(how="all")
+        if not ticker_df.empty:
+            bars[ticker] = normalise_bars(ticker_df, interval)
+    return bars
+
+
+def _with_retries(download, tickers, retries, backoff):
+    """
+    Call download(tickers) and retry the tickers missing from its result.
+    A failed multi-ticker yfinance request leaves tickers out instead of
+    raising, so missing tickers are retried the same as an exception.
+
+    Returns:
+    tuple: Dict of ticker -> bars, attempts per ticker, and the last error
+        of every ticker that never returned bars
+    """
+    bars, attempts, errors = {}, {}, {}
+    remaining = list(tickers)
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        for ticker in remaining:
+            attempts[ticker] = attempt + 1
+        try:
+            result = download(remaining)
+        except Exception as e:
+            errors.update((ticker, repr(e)) for ticker in remaining)
+            continue
+        bars.update((ticker, df) for ticker, df in result.items() if ticker in remaining and not df.empty)
+        remaining = [ticker for ticker in remaining if ticker not in bars]
+        errors = {ticker: "no data" for ticker in remaining}
+        if not remaining:
+            break
+    return bars, attempts, errors
+
+
+def fetch_many(tickers, end, start=None, batch_size=20, max_workers=4, retries=3, backoff=1.0,
+               downloader=download_bars_batch):
+    """
+    Fetch daily and minute bars for a whole watchlist using batched requests.
+
+    Tickers are grouped into batches of batch_size, each batch makes one daily
+    and one minute request, and batches run on a thread pool of max_workers.
+    Failed requests, and tickers a request returned nothing for, are retried
+    with exponential backoff.
+
+    Parameters:
+    tickers (list): Ticker symbols
+    end (str): End date in format 'YYYY-MM-DD' (exclusive)
+    start (str): Optional start date for the daily bars
+    batch_size (int): Number of tickers per request
+    max_workers (int): Number of batches downloaded at the same time
+    retries (int): Number of retries per ticker before it is marked failed
+    backoff (float): Seconds to wait before the first retry, doubled on every retry
+    downloader (callable): Function (tickers, start, end, interval) -> dict of bars,
+        swap in a fake source to run offline
+
+    Returns:
+    tuple: Dict of ticker -> (daily_df, minute_df) and a report DataFrame with
+        the latency, attempts and error for every ticker
+    """
+    if start is None:
+        end_dt = pd.to_datetime(end)
+        start = (end_dt - timedelta(days=365)).strftime('%Y-%m-%d')
+    end_dt = pd.to_datetime(end)
+    minute_start = (end_dt - timedelta(days=6)).strftime('%Y-%m-%d')
+
+    tickers = list(dict.fromkeys(tickers))
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+
+    def fetch_batch(batch):
+        started = time.perf_counter()
+        daily, daily_attempts, daily_errors = _with_retries(
+            lambda remaining: downloader(remaining, start, end, "1d"), batch, retries, backoff)
+        minute, minute_attempts, minute_errors = _with_retries(
+            lambda remaining: downloader(remaining, minute_start, end, "1m"), batch, retries, backoff)
+        latency = time.perf_counter() - started
+
+        results, report = {}, []
+        for ticker in batch:
+            daily_df = daily.get(ticker, empty_bars())
+            minute_df = minute.get(ticker, empty_bars())
+            error = None
+            if daily_df.empty and minute_df.empty:
+                error = daily_errors.get(ticker) or minute_errors.get(ticker)
+            else:
+                results[ticker] = (fill_daily_from_minutes(daily_df, minute_df), minute_df)
+            report.append({
+                "ticker": ticker,
+                "latency": latency,
+                "attempts": max(daily_attempts[ticker], minute_attempts[ticker]),
+                "error": error,
+            })
+        return results, report
+
+    results, report = {}, []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for batch_results, batch_report in pool.map(fetch_batch, batches):
+            results.update(batch_results)
+            report.extend(batch_report)
+
+    report = pd.DataFrame(report, columns=["ticker", "latency", "attempts", "error"])
+    return results, report
+
 # # Example usage:
 # daily_df, minute_df = fetch_yfinance_data("AAPL", "2025-06-09")
 # print(daily_df.head())
@@ -95,15 +443,13 @@ def fetch_yfinance_data(ticker, end, start=None):
 # plt.legend()
 # plt.show()
 
-stock = "OKYO"
-daily_df, minute_df = fetch_yfinance_data(stock, "2025-06-21")
+if __name__ == "__main__":
+    stock = "OKYO"
+    daily_df, minute_df = fetch_yfinance_data(stock, "2025-06-21")
 
-minute_df['plot_date'] = pd.to_datetime(minute_df['date']).dt.tz_localize(None)
-# print(minute_df.head())
-# Filter for June 20th only
-target_date = pd.to_datetime("2025-06-20").date()
-# print(target_date)
-mask = minute_df['plot_date'].dt.date == target_date
-day_df = minute_df[mask]
+    # Filter for June 20th only
+    target_date = pd.to_datetime("2025-06-20").date()
+    day_df = slice_bars(minute_df, target_date, target_date + timedelta(days=1)).copy()
+    day_df['plot_date'] = day_df['date'].dt.tz_localize(None)
 
-print(day_df['plot_date'].min(), day_df['plot_date'].max())
\ No newline at end of file
+    print(day_df['plot_date'].min(), day_df['plot_date'].max())
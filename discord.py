@@ -1,92 +1,182 @@
 import pandas as pd
 import re
 import os
+import json
 import matplotlib.pyplot as plt
 from datetime import datetime
 import pytz
 
 file_path = 'discord_tickers.txt'
 csv_path = 'discord_tickers.csv'
+state_path = 'discord_tickers.state.json'
 
-entries = []
 ticker_pattern = re.compile(r'^Ticker:\s*(\S+)')
 timestamp_pattern = re.compile(r'—\s*(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2})')
-
-with open(file_path, 'r', encoding='utf-8') as f:
-    lines = f.readlines()
-
-i = 0
-while i < len(lines):
-    m = ticker_pattern.match(lines[i])
-    if m:
-        ticker_raw = m.group(1)
-        ticker = re.sub(r'[^A-Za-z0-9]', '', ticker_raw)
-        timestamp = None
-        j = i + 1
-        while j < len(lines):
-            tm = timestamp_pattern.search(lines[j])
-            if tm:
-                timestamp = tm.group(1)
+# Older posts give the levels as 'Add zones: $X or lower' and '— Stop loss: Below $X'
+entry_pattern = re.compile(r'^(?:—\s*)?(?:Entry|Add zones):.*?\$\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+stop_pattern = re.compile(r'^(?:—\s*)?(?:S/L|Stop loss):.*?\$\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+
+CSV_COLUMNS = ['Ticker', 'Date', 'Day_of_Week', 'GMT', 'EST', 'Entry', 'SL']
+
+
+class PostParser:
+    """
+    Line by line state machine over the Discord export.
+
+    A 'Ticker:' line opens a post, the 'Entry:' (or 'Add zones:') and 'S/L:'
+    (or 'Stop loss:') lines after it fill in its levels, and the next timestamp line closes every open post. The
+    open posts are kept in `pending` so parsing can stop and resume between
+    calls without rescanning the file.
+    """
+
+    def __init__(self, pending=None):
+        self.pending = pending or []
+
+    def feed(self, line):
+        """
+        Parse one line.
+
+        Returns:
+        list: Posts completed by this line, as dicts with Ticker, Posted, Entry and SL
+        """
+        m = ticker_pattern.match(line)
+        if m:
+            ticker = re.sub(r'[^A-Za-z0-9]', '', m.group(1))
+            self.pending.append({'Ticker': ticker, 'Posted': None, 'Entry': None, 'SL': None})
+            return []
+
+        if self.pending:
+            m = entry_pattern.match(line)
+            if m and self.pending[-1]['Entry'] is None:
+                self.pending[-1]['Entry'] = float(m.group(1))
+                return []
+            m = stop_pattern.match(line)
+            if m and self.pending[-1]['SL'] is None:
+                self.pending[-1]['SL'] = float(m.group(1))
+                return []
+
+        tm = timestamp_pattern.search(line)
+        if tm and self.pending:
+            completed = self.pending
+            for post in completed:
+                post['Posted'] = tm.group(1)
+            self.pending = []
+            return completed
+        return []
+
+
+def parse_posts(lines, parser=None):
+    """
+    Stream posts out of the lines of a Discord export.
+
+    Parameters:
+    lines (iterable): Lines of the export, e.g. an open file
+    parser (PostParser): Optional parser to resume from
+
+    Yields:
+    dict: One post at a time with Ticker, Posted, Entry and SL
+    """
+    parser = parser or PostParser()
+    for line in lines:
+        yield from parser.feed(line)
+
+
+def posts_to_frame(posts):
+    """
+    Build the readable CSV table from parsed posts, converting timezones once.
+
+    Returns:
+    DataFrame: Posts with CSV_COLUMNS
+    """
+    df = pd.DataFrame(posts, columns=['Ticker', 'Posted', 'Entry', 'SL'])
+    posted = pd.to_datetime(df['Posted'], format='%d/%m/%Y %H:%M', errors='coerce').dt.tz_localize('UTC')
+    eastern = posted.dt.tz_convert(pytz.timezone('US/Eastern'))
+
+    df['Date'] = posted.dt.strftime('%Y-%m-%d')
+    df['Day_of_Week'] = posted.dt.strftime('%A')
+    df['GMT'] = posted.dt.strftime('%H:%M')
+    df['EST'] = eastern.dt.strftime('%H:%M')
+    return df[CSV_COLUMNS]
+
+
+def ingest(file_path=file_path, csv_path=csv_path, state_path=state_path, full=False):
+    """
+    Append the posts added to the export since the last run to the CSV.
+
+    The byte offset of the last complete line and the posts still waiting for
+    their timestamp are kept in state_path, so only new lines are parsed.
+
+    Parameters:
+    file_path (str): Discord export
+    csv_path (str): CSV the posts are appended to
+    state_path (str): JSON file holding the parser position
+    full (bool): Ignore the saved state and rebuild the CSV from the start
+
+    Returns:
+    DataFrame: The newly added posts
+    """
+    state = {'offset': 0, 'pending': []}
+    if not full and os.path.exists(state_path) and os.path.exists(csv_path):
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+
+    parser = PostParser(state['pending'])
+    offset = state['offset']
+    posts = []
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        for raw in f:
+            # Leave a partially written last line for the next run
+            if not raw.endswith(b'\n'):
                 break
-            j += 1
-        entries.append({'Ticker': ticker, 'Posted': timestamp})
-    i += 1
-
-df = pd.DataFrame(entries)
-df['Posted'] = pd.to_datetime(df['Posted'], format='%d/%m/%Y %H:%M', errors='coerce')
-
-# Add timezone columns with proper names from the start
-eastern = pytz.timezone('US/Eastern')
-df['GMT'] = df['Posted'].dt.tz_localize('UTC')
-df['EST'] = df['GMT'].dt.tz_convert(eastern)
-
-# Add readable date and day columns
-df['Date'] = df['GMT'].dt.strftime('%Y-%m-%d')
-df['Day_of_Week'] = df['GMT'].dt.strftime('%A')
-df['GMT'] = df['GMT'].dt.strftime('%H:%M')
-df['EST'] = df['EST'].dt.strftime('%H:%M')
-
-# Keep only the columns we want
-df = df[['Ticker', 'Date', 'Day_of_Week', 'GMT', 'EST']].copy()
-
-# Save the CSV
-df.to_csv(csv_path, index=False)
-
-print("Readable DataFrame:")
-print(df.head())
-print(f"Total entries: {len(df)}")
-print(f"Unique tickers: {len(df['Ticker'].unique())}")
-
-# Extract day of week for analysis - need to recreate this since we removed Posted column
-df_temp = pd.DataFrame(entries)
-df_temp['Posted'] = pd.to_datetime(df_temp['Posted'], format='%d/%m/%Y %H:%M', errors='coerce')
-df_temp['DayOfWeek'] = df_temp['Posted'].dt.day_name()
-
-# Count number of posts per day of week
-counts = df_temp['DayOfWeek'].value_counts()
-
-# Reindex to get days in correct order
-days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-counts = counts.reindex(days_order)
-
-# # Plot bar chart
-# plt.figure(figsize=(10, 5))
-# counts.plot(kind='bar')
-# plt.xlabel('Day of Week')
-# plt.ylabel('Number of Tickers Posted')
-# plt.title('Number of Tickers Posted By Day of Week')
-# plt.tight_layout()
-# plt.show()
-
-# Show top tickers by frequency
-print(f"\nMost frequent tickers:")
-ticker_counts = df['Ticker'].value_counts().head(20)
-for ticker, count in ticker_counts.items():
-    print(f"  {ticker}: {count} posts")
-
-# Show posting patterns by day
-print(f"\nPosting patterns by day:")
-day_counts = df['Day_of_Week'].value_counts().reindex(days_order)
-for day, count in day_counts.items():
-    if pd.notna(count):
-        print(f"  {day}: {int(count)} posts")
\ No newline at end of file
+            offset += len(raw)
+            posts.extend(parser.feed(raw.decode('utf-8')))
+
+    new_df = posts_to_frame(posts)
+    if state['offset'] == 0:
+        new_df.to_csv(csv_path, index=False)
+    elif not new_df.empty:
+        new_df.to_csv(csv_path, mode='a', header=False, index=False)
+
+    with open(state_path, 'w') as f:
+        json.dump({'offset': offset, 'pending': parser.pending}, f)
+    return new_df
+
+
+if __name__ == "__main__":
+    import sys
+
+    new_df = ingest(full='--full' in sys.argv)
+    df = pd.read_csv(csv_path)
+
+    print("Readable DataFrame:")
+    print(df.head())
+    print(f"New entries: {len(new_df)}")
+    print(f"Total entries: {len(df)}")
+    print(f"Unique tickers: {len(df['Ticker'].unique())}")
+
+    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+    # Count number of posts per day of week
+    counts = df['Day_of_Week'].value_counts().reindex(days_order)
+
+    # # Plot bar chart
+    # plt.figure(figsize=(10, 5))
+    # counts.plot(kind='bar')
+    # plt.xlabel('Day of Week')
+    # plt.ylabel('Number of Tickers Posted')
+    # plt.title('Number of Tickers Posted By Day of Week')
+    # plt.tight_layout()
+    # plt.show()
+
+    # Show top tickers by frequency
+    print(f"\nMost frequent tickers:")
+    ticker_counts = df['Ticker'].value_counts().head(20)
+    for ticker, count in ticker_counts.items():
+        print(f"  {ticker}: {count} posts")
+
+    # Show posting patterns by day
+    print(f"\nPosting patterns by day:")
+    for day, count in counts.items():
+        if pd.notna(count):
+            print(f"  {day}: {int(count)} posts")
@@ -0,0 +1,207 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from data import download_bars, epoch_ns, EXCHANGE_TZ
+from cache import BarCache, DEFAULT_CACHE_DIR
+from spikes import load_posts
+
+DEFAULT_STORE_PATH = "features.parquet"
+
+# Bump when the feature definitions change so stored rows are recomputed
+FEATURE_VERSION = 2
+
+RETURN_BARS = (5, 15, 30, 60, 390)
+RETURN_DAYS = (1, 5, 21)
+VOLUME_BARS = (5, 15, 30, 60)
+LABEL_MINUTES = (5, 10, 15, 30, 60)
+
+
+def add_repost_features(posts):
+    """
+    Number of earlier posts of the same ticker and days since the previous one,
+    for checking whether the 2nd or 3rd post of a stock behaves differently.
+    """
+    posts = posts.sort_values("posted").copy()
+    grouped = posts.groupby("Ticker")["posted"]
+    posts["repost_count"] = grouped.cumcount()
+    posts["days_since_last_post"] = grouped.diff().dt.total_seconds() / 86400
+    return posts.sort_index()
+
+
+def _price_at(times, close, at_ns):
+    # Close of the bar covering the minute before at_ns. NaN when no bar started
+    # in that minute, e.g. at_ns is after the close, so a stale pre-post price
+    # is never used as a label
+    idx = np.searchsorted(times, at_ns, side="left") - 1
+    if idx < 0 or times[idx] < at_ns - 60e9:
+        return np.nan
+    return close[idx]
+
+
+def post_features(minute_df, daily_df, posted, baseline_bars=1950, exchange_tz=EXCHANGE_TZ):
+    """
+    Features known at the time of a post and forward-return labels after it.
+
+    Features use only bars that started before the post: returns over the
+    last RETURN_BARS minute bars and RETURN_DAYS daily bars, volume over the
+    last VOLUME_BARS bars relative to the last baseline_bars bars, the
+    distance to the session VWAP, and the time of day. Labels are the return
+    from the post to LABEL_MINUTES minutes after it, NaN when there is no bar
+    in the last minute of that horizon.
+
+    Parameters:
+    minute_df (DataFrame): Minute bars around the post
+    daily_df (DataFrame): Daily bars before the post
+    posted (Timestamp): Tz-aware post time
+    baseline_bars (int): Bars the volume rates are compared to
+
+    Returns:
+    dict: Features and labels, with status 'ok' or the reason they could not be computed
+    """
+    posted = pd.Timestamp(posted)
+    local = posted.tz_convert(exchange_tz)
+    row = {
+        "minutes_from_open": (local - local.normalize()).total_seconds() / 60 - 9.5 * 60,
+        "day_of_week": local.dayofweek,
+    }
+    if minute_df.empty:
+        return {"status": "no data", **row}
+
+    minute_df = minute_df.sort_values("date")
+    times = epoch_ns(minute_df["date"])
+    close = minute_df["close"].to_numpy(dtype=np.float64)
+    volume = minute_df["volume"].to_numpy(dtype=np.float64)
+    vwap = minute_df["sessionVWAP"].to_numpy(dtype=np.float64)
+
+    post_idx = np.searchsorted(times, posted.value, side="left")
+    if post_idx == 0:
+        return {"status": "no bars before post", **row}
+    last = post_idx - 1
+    price = close[last]
+
+    for bars in RETURN_BARS:
+        row[f"ret_{bars}m"] = price / close[last - bars] - 1 if last - bars >= 0 and close[last - bars] else np.nan
+
+    if not daily_df.empty:
+        # Only sessions that finished before the post's exchange day
+        daily_df = daily_df[daily_df["date"] < local.normalize()].sort_values("date")
+    daily_close = daily_df["close"].to_numpy(dtype=np.float64) if not daily_df.empty else np.empty(0)
+    for days in RETURN_DAYS:
+        row[f"ret_{days}d"] = (daily_close[-1] / daily_close[-1 - days] - 1
+                               if len(daily_close) > days and daily_close[-1 - days] else np.nan)
+
+    baseline = volume[max(post_idx - baseline_bars, 0):post_idx]
+    baseline_mean = baseline.mean() if len(baseline) else np.nan
+    for bars in VOLUME_BARS:
+        recent = volume[max(post_idx - bars, 0):post_idx]
+        row[f"vol_rate_{bars}m"] = recent.mean() / baseline_mean if len(recent) == bars and baseline_mean else np.nan
+
+    row["vwap_distance"] = price / vwap[last] - 1 if vwap[last] else np.nan
+
+    for minutes in LABEL_MINUTES:
+        future = _price_at(times, close, posted.value + int(minutes * 60e9))
+        row[f"fwd_{minutes}m"] = future / price - 1 if price else np.nan
+    return {"status": "ok", **row}
+
+
+def _content_key(post, minute_df, daily_df, kwargs):
+    """Hash of everything a post's row depends on: the post, the bars used and the parameters."""
+    digest = hashlib.sha256()
+    digest.update(repr((FEATURE_VERSION, post.Ticker, post.posted.value, post.repost_count,
+                        post.days_since_last_post, sorted(kwargs.items()))).encode())
+    for df in (minute_df, daily_df):
+        if not df.empty:
+            digest.update(epoch_ns(df["date"]).tobytes())
+            digest.update(df[["close", "volume", "sessionVWAP"]].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def _ticker_features(args):
+    ticker, ticker_posts, cache_dir, known, lookback_days, kwargs = args
+    cache = BarCache(cache_dir) if cache_dir else None
+    fetch = cache.get_bars if cache is not None else lambda t, i, s, e: download_bars(t, s, e, i)
+    rows = []
+    for post in ticker_posts.itertuples(index=False):
+        base = {"Ticker": ticker, "Date": post.Date, "GMT": post.GMT, "posted": post.posted,
+                "repost_count": post.repost_count, "days_since_last_post": post.days_since_last_post}
+        if pd.isna(post.posted):
+            rows.append({**base, "status": "bad timestamp"})
+            continue
+        minute_start = (post.posted - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+        daily_start = (post.posted - timedelta(days=45)).strftime('%Y-%m-%d')
+        end = (post.posted + timedelta(days=2)).strftime('%Y-%m-%d')
+        try:
+            minute_df = fetch(ticker, "1m", minute_start, end)
+            daily_df = fetch(ticker, "1d", daily_start, post.posted.strftime('%Y-%m-%d'))
+        except Exception as e:
+            rows.append({**base, "status": f"error: {e!r}"})
+            continue
+        key = _content_key(post, minute_df, daily_df, kwargs)
+        if key in known:
+            rows.append({"key": key})
+            continue
+        rows.append({**base, "key": key, **post_features(minute_df, daily_df, post.posted, **kwargs)})
+    return rows
+
+
+def build_features(posts, cache_dir=DEFAULT_CACHE_DIR, store_path=DEFAULT_STORE_PATH, processes=None,
+                   lookback_days=7, **kwargs):
+    """
+    Build the training matrix for the posts, one worker process per ticker group.
+
+    Every row is stored in store_path under the content hash of its inputs,
+    so a rerun only computes the rows of new posts, or of posts whose bars
+    changed (e.g. the label window was not complete last time).
+
+    Parameters:
+    posts (DataFrame): Posts from spikes.load_posts
+    cache_dir (str): BarCache directory to fetch bars through, None to download directly
+    store_path (str): Parquet file the rows are kept in, None to always recompute
+    processes (int): Number of worker processes, defaults to the CPU count
+    lookback_days (int): Calendar days of minute bars before each post
+    **kwargs: Passed on to post_features
+
+    Returns:
+    tuple: The matrix (one row per post, features then fwd_* labels) and a
+        dict with the number of rows computed and reused
+    """
+    stored = pd.DataFrame()
+    if store_path and os.path.exists(store_path):
+        stored = pd.read_parquet(store_path).drop_duplicates("key").set_index("key", drop=False)
+    known = set(stored.index)
+
+    posts = add_repost_features(posts)
+    jobs = [(ticker, group, cache_dir, known, lookback_days, kwargs)
+            for ticker, group in posts.groupby("Ticker", sort=False)]
+    rows = []
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        for ticker_rows in pool.map(_ticker_features, jobs):
+            rows.extend(ticker_rows)
+
+    reused = [row["key"] for row in rows if len(row) == 1]
+    computed = pd.DataFrame([row for row in rows if len(row) > 1])
+    matrix = pd.concat([stored.loc[reused], computed], ignore_index=True) if reused else computed
+    matrix = matrix.sort_values(["posted", "Ticker"]).reset_index(drop=True)
+
+    if store_path:
+        matrix[matrix["key"].notna()].to_parquet(store_path, index=False)
+    return matrix, {"computed": len(computed), "reused": len(reused)}
+
+
+def feature_columns(matrix):
+    """Feature and label column names of a matrix from build_features."""
+    labels = [f"fwd_{minutes}m" for minutes in LABEL_MINUTES]
+    skip = {"Ticker", "Date", "GMT", "posted", "status", "key", *labels}
+    return [column for column in matrix.columns if column not in skip], labels
+
+
+if __name__ == "__main__":
+    posts = load_posts('discord_tickers.csv')
+    matrix, stats = build_features(posts)
+    features, labels = feature_columns(matrix)
+    ok = matrix[matrix["status"] == "ok"]
+    print(f"{len(matrix)} posts, {stats['computed']} computed, {stats['reused']} reused, {len(ok)} usable")
+    print(ok[["Ticker", "Date", *features[:6], *labels]].tail(20).to_string(index=False))
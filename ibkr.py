@@ -0,0 +1,282 @@
+import asyncio
+import threading
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from data import BAR_COLUMNS, EXCHANGE_TZ, empty_bars, session_vwap, fill_daily_from_minutes
+
+# IB historical data pacing: at most 60 requests in any 10 minutes, no more
+# than 5 requests for the same contract within 2 seconds, and no identical
+# request repeated within 15 seconds
+PACING_REQUESTS, PACING_SECONDS = 60, 600
+CONTRACT_REQUESTS, CONTRACT_SECONDS = 5, 2
+IDENTICAL_SECONDS = 15
+
+# Longest duration requested per chunk for each interval
+BAR_SETTINGS = {
+    "1m": ("1 min", timedelta(days=1), "86400 S"),
+    "1d": ("1 day", timedelta(days=365), "1 Y"),
+}
+
+
+class SlidingWindow:
+    """Send times of the last `window` seconds, allowing at most `limit` sends in any window."""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.sent = deque()
+
+    def wait_time(self, now):
+        """Seconds until one more send fits in the window, 0 if it fits now."""
+        while self.sent and self.sent[0] <= now - self.window:
+            self.sent.popleft()
+        if len(self.sent) < self.limit:
+            return 0.0
+        return self.sent[0] + self.window - now
+
+    def record(self, now):
+        self.sent.append(now)
+
+
+class PacingScheduler:
+    """
+    Runs IB historical requests within the pacing rules.
+
+    A request is sent once it fits in both the global window and its
+    contract's window, and its send time is then recorded in both. Identical requests that are in flight share one
+    result, and identical requests within IDENTICAL_SECONDS of a finished
+    one are answered from memory instead of being sent again.
+    """
+
+    def __init__(self, max_in_flight=10, clock=time.monotonic):
+        self.clock = clock
+        self.global_window = SlidingWindow(PACING_REQUESTS, PACING_SECONDS)
+        self.contract_windows = {}
+        self.in_flight = {}
+        self.recent = {}
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.stats = {"sent": 0, "deduplicated": 0}
+
+    async def run(self, key, symbol, request):
+        """
+        Parameters:
+        key (tuple): Identity of the request, used for deduplication
+        symbol (str): Contract the request is for
+        request (callable): Coroutine function sending the request
+        """
+        recent = self.recent.get(key)
+        if recent is not None and self.clock() - recent[0] < IDENTICAL_SECONDS:
+            self.stats["deduplicated"] += 1
+            return recent[1]
+        if key in self.in_flight:
+            self.stats["deduplicated"] += 1
+            return await asyncio.shield(self.in_flight[key])
+
+        task = asyncio.ensure_future(self._send(key, symbol, request))
+        self.in_flight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self.in_flight.pop(key, None)
+
+    async def _pace(self, window):
+        # Both windows are checked and stamped together with no await in between,
+        # so neither records a send earlier than it actually happens
+        while True:
+            now = self.clock()
+            wait = max(self.global_window.wait_time(now), window.wait_time(now))
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        self.global_window.record(now)
+        window.record(now)
+
+    async def _send(self, key, symbol, request):
+        window = self.contract_windows.setdefault(symbol, SlidingWindow(CONTRACT_REQUESTS, CONTRACT_SECONDS))
+        async with self.semaphore:
+            await self._pace(window)
+            self.stats["sent"] += 1
+            result = await request()
+        now = self.clock()
+        self.recent = {k: v for k, v in self.recent.items() if now - v[0] < IDENTICAL_SECONDS}
+        self.recent[key] = (now, result)
+        return result
+
+
+def bars_to_frame(bars, interval, exchange_tz=EXCHANGE_TZ):
+    """
+    Convert ib_insync BarData objects to the fetch_yfinance_data schema.
+
+    IB provides the real average price and trade count, which are kept as
+    averageWAP and barCount.
+    """
+    if not bars:
+        return empty_bars(exchange_tz)
+    df = pd.DataFrame({
+        "date": [bar.date for bar in bars],
+        "open": [bar.open for bar in bars],
+        "high": [bar.high for bar in bars],
+        "low": [bar.low for bar in bars],
+        "close": [bar.close for bar in bars],
+        "volume": [bar.volume for bar in bars],
+        "averageWAP": [bar.average for bar in bars],
+        "barCount": [bar.barCount for bar in bars],
+    })
+    dates = pd.to_datetime(df["date"])
+    if dates.dt.tz is None:
+        # Daily bars come back as plain dates in the exchange timezone
+        dates = dates.dt.tz_localize(exchange_tz)
+    df["date"] = dates.dt.tz_convert(exchange_tz)
+    df["averageWAP"] = pd.to_numeric(df["averageWAP"], errors="coerce").astype(np.float64)
+    df["sessionVWAP"] = session_vwap(df, interval, exchange_tz)
+    return df[BAR_COLUMNS]
+
+
+def _stock(ticker):
+    from ib_insync import Stock
+    return Stock(ticker, "SMART", "USD")
+
+
+class IBKRDataSource:
+    """
+    Asyncio historical bar client on one shared ib_insync connection.
+
+    Long ranges are split into chunks that IB serves in one request, and all
+    requests go through a PacingScheduler.
+    """
+
+    def __init__(self, host='172.21.224.1', port=7497, client_id=205, ib=None, contract_factory=_stock,
+                 max_in_flight=10, clock=time.monotonic):
+        """
+        Parameters:
+        host (str): TWS / gateway host
+        port (int): TWS / gateway port
+        client_id (int): IB API client id
+        ib (IB): Optional existing connection, e.g. a ReplayIB for testing
+        contract_factory (callable): Ticker -> contract
+        max_in_flight (int): Maximum number of requests waiting on IB at once
+        """
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+        self.ib = ib
+        self.contract_factory = contract_factory
+        self.scheduler = PacingScheduler(max_in_flight, clock)
+        self._connect_lock = None
+        self._loop = None
+        self._run_lock = threading.Lock()
+        self.contracts = {}
+
+    async def connect(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.ib is None:
+                from ib_insync import IB
+                self.ib = IB()
+            if not self.ib.isConnected():
+                await self.ib.connectAsync(host=self.host, port=self.port, clientId=self.client_id, timeout=10)
+        return self.ib
+
+    def _contract(self, ticker):
+        if ticker not in self.contracts:
+            self.contracts[ticker] = self.contract_factory(ticker)
+        return self.contracts[ticker]
+
+    async def _request_chunk(self, ticker, interval, chunk_end, duration):
+        ib = await self.connect()
+        bar_size, _, _ = BAR_SETTINGS[interval]
+        contract = self._contract(ticker)
+        use_rth = interval == "1d"
+        key = (ticker, chunk_end.isoformat(), duration, bar_size, "TRADES", use_rth)
+
+        async def request():
+            return await ib.reqHistoricalDataAsync(
+                contract,
+                endDateTime=chunk_end.to_pydatetime(),
+                durationStr=duration,
+                barSizeSetting=bar_size,
+                whatToShow="TRADES",
+                useRTH=use_rth,
+                formatDate=2,
+            )
+
+        return await self.scheduler.run(key, ticker, request)
+
+    async def get_bars_async(self, ticker, interval, start, end):
+        """
+        Fetch bars between start (inclusive) and end (exclusive) in chunks.
+
+        Parameters:
+        ticker (str): The stock ticker symbol
+        interval (str): '1d' or '1m'
+        start (str): Start date in format 'YYYY-MM-DD'
+        end (str): End date in format 'YYYY-MM-DD'
+
+        Returns:
+        DataFrame: Bars with BAR_COLUMNS
+        """
+        if interval not in BAR_SETTINGS:
+            raise ValueError(f"Unsupported interval: {interval}")
+        _, chunk, duration = BAR_SETTINGS[interval]
+        start_ts = pd.Timestamp(start).tz_localize(EXCHANGE_TZ)
+        end_ts = pd.Timestamp(end).tz_localize(EXCHANGE_TZ)
+
+        chunk_ends = []
+        chunk_end = end_ts
+        while chunk_end > start_ts:
+            chunk_ends.append(chunk_end.tz_convert("UTC"))
+            chunk_end -= chunk
+        results = await asyncio.gather(*(self._request_chunk(ticker, interval, ce, duration) for ce in chunk_ends))
+
+        frames = [bars_to_frame(bars, interval) for bars in results]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return empty_bars()
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset="date").sort_values("date")
+        df = df[(df["date"] >= start_ts) & (df["date"] < end_ts)]
+        return df.reset_index(drop=True)
+
+    async def fetch_async(self, ticker, end, start=None):
+        """Same result as fetch_yfinance_data: (daily_df, minute_df) with 1 year / 6 days by default."""
+        end_dt = pd.to_datetime(end)
+        if start is None:
+            start = (end_dt - timedelta(days=365)).strftime('%Y-%m-%d')
+        minute_start = (end_dt - timedelta(days=6)).strftime('%Y-%m-%d')
+        daily_df, minute_df = await asyncio.gather(
+            self.get_bars_async(ticker, "1d", start, end),
+            self.get_bars_async(ticker, "1m", minute_start, end),
+        )
+        return fill_daily_from_minutes(daily_df, minute_df), minute_df
+
+    async def fetch_many_async(self, tickers, end, start=None):
+        results = await asyncio.gather(*(self.fetch_async(ticker, end, start) for ticker in tickers),
+                                       return_exceptions=True)
+        return dict(zip(tickers, results))
+
+    def run(self, coroutine):
+        # One event loop for the life of the source so the IB connection is reused,
+        # and one blocking call at a time since callers may be on different threads
+        with self._run_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+            return self._loop.run_until_complete(coroutine)
+
+    def fetch(self, ticker, end, start=None):
+        """Blocking wrapper around fetch_async."""
+        return self.run(self.fetch_async(ticker, end, start))
+
+    def get_bars(self, ticker, interval, start, end):
+        """Blocking wrapper around get_bars_async."""
+        return self.run(self.get_bars_async(ticker, interval, start, end))
+
+
+if __name__ == "__main__":
+    source = IBKRDataSource()
+    daily_df, minute_df = source.fetch("GME", "2025-06-09")
+    print(daily_df.tail())
+    print(minute_df.tail())
+    print(source.scheduler.stats)
@@ -0,0 +1,232 @@
+import os
+import sys
+import time
+import json
+import atexit
+import cProfile
+import pstats
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# Set INSTRUMENT=1 to record spans and counters and print a report at exit,
+# INSTRUMENT_PROFILE=cprofile or sample to also profile the run. Traces and
+# profiles are written to INSTRUMENT_DIR. Only the main process is recorded,
+# spans inside ProcessPoolExecutor workers are not collected.
+DEFAULT_TRACE_DIR = "traces"
+
+_NULL_SPAN = nullcontext()
+
+
+class Recorder:
+    """Spans and counters of one run, kept in memory until the report is written."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            ended = time.perf_counter()
+            # list.append is atomic, so spans from worker threads need no lock
+            self.spans.append((name, started - self.origin, ended - started, threading.get_ident(), attrs))
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def summary(self):
+        """Calls, total, mean and max seconds per span name, slowest total first."""
+        grouped = defaultdict(list)
+        for name, _, duration, _, _ in self.spans:
+            grouped[name].append(duration)
+        rows = [{"span": name, "calls": len(durations), "total_s": sum(durations),
+                 "mean_ms": 1e3 * sum(durations) / len(durations), "max_ms": 1e3 * max(durations)}
+                for name, durations in grouped.items()]
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def report(self):
+        lines = [f"{'span':<32}{'calls':>8}{'total s':>12}{'mean ms':>12}{'max ms':>12}"]
+        for row in self.summary():
+            lines.append(f"{row['span']:<32}{row['calls']:>8}{row['total_s']:>12.3f}"
+                         f"{row['mean_ms']:>12.2f}{row['max_ms']:>12.2f}")
+        if self.counters:
+            lines.append("")
+            lines.extend(f"{name:<32}{value:>12,}" for name, value in sorted(self.counters.items()))
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """Write the spans in Chrome trace event format, viewable in chrome://tracing or Perfetto."""
+        events = [{"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": os.getpid(),
+                   "tid": thread, "args": {key: str(value) for key, value in attrs.items()}}
+                  for name, start, duration, thread, attrs in self.spans]
+        events.extend({"name": name, "ph": "C", "ts": 0, "pid": os.getpid(), "args": {name: value}}
+                      for name, value in self.counters.items())
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "counters": dict(self.counters), "summary": self.summary()}, f)
+
+
+class Sampler:
+    """
+    Sampling profiler: a background thread records the main thread's stack
+    every interval seconds. Output is in collapsed-stack format, one
+    'frame;frame;frame count' line per stack, as read by flamegraph tools.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self.target = threading.main_thread().ident
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+_recorder = None
+_profiler = None
+_trace_dir = DEFAULT_TRACE_DIR
+_run_name = "run"
+
+
+def enabled():
+    return _recorder is not None
+
+
+def span(name, **attrs):
+    """
+    Time a block of code:
+
+        with span("download", ticker=ticker):
+            ...
+
+    Returns a shared no-op context manager when instrumentation is off.
+    """
+    if _recorder is None:
+        return _NULL_SPAN
+    return _recorder.span(name, **attrs)
+
+
+def traced(name=None):
+    """Decorator version of span, named after the function by default."""
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return fn(*args, **kwargs)
+            with _recorder.span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1):
+    """Add n to a counter, e.g. rows or bytes downloaded."""
+    if _recorder is not None:
+        _recorder.count(name, n)
+
+
+def enable(profile=None, trace_dir=None, run_name=None):
+    """
+    Turn instrumentation on for the rest of the process and write the report
+    when it exits.
+
+    Parameters:
+    profile (str): None, 'cprofile' for deterministic profiling or 'sample'
+        for the low overhead sampling profiler
+    trace_dir (str): Directory the trace, profile and report files go to
+    run_name (str): Prefix of the output files, defaults to the script name
+    """
+    global _recorder, _profiler, _trace_dir, _run_name
+    if _recorder is not None:
+        return
+    _recorder = Recorder()
+    _trace_dir = trace_dir or os.environ.get("INSTRUMENT_DIR", DEFAULT_TRACE_DIR)
+    _run_name = run_name or os.path.splitext(os.path.basename(sys.argv[0] or "run"))[0] or "run"
+    if profile == "cprofile":
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    elif profile == "sample":
+        _profiler = Sampler()
+        _profiler.start()
+    elif profile:
+        raise ValueError(f"Unknown profiler: {profile}")
+    atexit.register(finish)
+
+
+def finish():
+    """Stop profiling, print the report and write the trace files. Returns the path prefix written to."""
+    global _recorder, _profiler
+    if _recorder is None:
+        return None
+    os.makedirs(_trace_dir, exist_ok=True)
+    prefix = os.path.join(_trace_dir, f"{_run_name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+
+    if isinstance(_profiler, cProfile.Profile):
+        _profiler.disable()
+        _profiler.dump_stats(f"{prefix}.prof")
+        pstats.Stats(_profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(20)
+    elif isinstance(_profiler, Sampler):
+        _profiler.stop()
+        _profiler.write(f"{prefix}.folded")
+
+    report = _recorder.report()
+    print(report, file=sys.stderr)
+    with open(f"{prefix}.txt", "w") as f:
+        f.write(report + "\n")
+    _recorder.write_trace(f"{prefix}.trace.json")
+    atexit.unregister(finish)
+    _recorder, _profiler = None, None
+    return prefix
+
+
+def add_arguments(parser):
+    """Add --trace and --profile to an argparse parser, see from_args."""
+    parser.add_argument("--trace", action="store_true", help="Record timing spans and counters")
+    parser.add_argument("--profile", choices=["cprofile", "sample"], default=None,
+                        help="Also profile the run, implies --trace")
+
+
+def from_args(args):
+    if args.trace or args.profile:
+        enable(args.profile)
+
+
+def _env_flag(name):
+    """The environment variable's value, None when unset or set to 0, false, no or off."""
+    value = os.environ.get(name, "").strip().lower()
+    return None if value in ("", "0", "false", "no", "off") else value
+
+
+if _env_flag("INSTRUMENT") or _env_flag("INSTRUMENT_PROFILE"):
+    enable(_env_flag("INSTRUMENT_PROFILE"))
@@ -0,0 +1,232 @@
+import os
+import matplotlib
+matplotlib.use("Agg")  # Headless, must be set before pyplot is imported anywhere
+import matplotlib.dates as mdates
+import matplotlib.ticker as mticker
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from analysis import window_bars
+from cache import BarCache, DEFAULT_CACHE_DIR
+from data import download_bars, EXCHANGE_TZ
+from instrument import span, add_arguments, from_args
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Parameters:
+    x (array): Increasing x values
+    y (array): y values
+    n_out (int): Number of points to keep
+
+    Returns:
+    ndarray: Indices of the points to keep, always including the first and last point
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket is the third point of the triangle
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev])
+                      - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
+
+
+class ChartTemplate:
+    """
+    Reusable price + cumulative volume chart.
+
+    The figure, axes, styling and locators are built once; each render only
+    swaps the line data, the target line and the title before saving.
+    """
+
+    def __init__(self, figsize=(16, 8), dpi=100):
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.fig)
+        self.fig.patch.set_facecolor('white')
+        ax1 = self.fig.add_subplot()
+
+        # Set grid background style
+        ax1.grid(True, linestyle='-', alpha=0.7, color='white', linewidth=1.2)
+        ax1.set_facecolor('#E6ECF7')
+        for spine in ax1.spines.values():
+            spine.set_visible(False)
+
+        self.price_line, = ax1.plot([], [], label='Close Price', color='blue', linewidth=1.5)
+        ax1.set_xlabel('Date and Time')
+        ax1.set_ylabel('Price', color='blue')
+        ax1.tick_params(axis='y', labelcolor='blue')
+        ax1.tick_params(axis='x', labelrotation=45)
+
+        self.target_lines = [
+            ax1.axvline(x=0, color='white', linestyle='--', linewidth=3, alpha=0.9, label='Target Time'),
+            ax1.axvline(x=0, color='darkgray', linestyle='--', linewidth=2, alpha=0.7),
+        ]
+
+        ax1.xaxis.set_major_locator(mdates.HourLocator(interval=6))
+        ax1.xaxis.set_minor_locator(mdates.HourLocator(interval=2))
+        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d\n%H:%M'))
+        ax1.yaxis.set_major_locator(mticker.MaxNLocator(nbins=8))
+        ax1.yaxis.set_minor_locator(mticker.MaxNLocator(nbins=16))
+
+        ax2 = ax1.twinx()
+        self.volume_line, = ax2.plot([], [], color='green', label='Cumulative Volume', linewidth=1.0, alpha=0.7)
+        ax2.set_ylabel('Cumulative Volume', color='green')
+        ax2.tick_params(axis='y', labelcolor='green')
+        ax2.yaxis.set_major_locator(mticker.MaxNLocator(nbins=8))
+        ax2.yaxis.set_minor_locator(mticker.MaxNLocator(nbins=16))
+        for spine in ax2.spines.values():
+            spine.set_visible(False)
+
+        lines = [self.price_line, self.target_lines[0], self.volume_line]
+        self.legend = ax1.legend(lines, [line.get_label() for line in lines], loc='upper left')
+        # Lay out once with a placeholder title so later titles fit without re-running tight_layout
+        self.title = ax1.set_title('TICKER Price and Volume around 2000-01-01 00:00')
+        self.ax1, self.ax2 = ax1, ax2
+        self.fig.tight_layout()
+
+    def render(self, day_df, target_datetime, title, target_label, path, max_points=None):
+        """
+        Draw one window of minute bars and save it.
+
+        Parameters:
+        day_df (DataFrame): Bars from window_bars
+        target_datetime (Timestamp): Tz-naive exchange time of the target line
+        title (str): Chart title
+        target_label (str): Legend label of the target line
+        path (str): Output file, the extension picks PNG or SVG
+        max_points (int): Optional number of points to downsample the series to with LTTB
+        """
+        x = mdates.date2num(day_df['plot_date'].to_numpy())
+        price = day_df['close'].to_numpy(dtype=np.float64)
+        volume = day_df['cumulative_volume'].to_numpy(dtype=np.float64)
+        if max_points:
+            keep = lttb(x, price, max_points)
+            x, price, volume = x[keep], price[keep], volume[keep]
+
+        self.price_line.set_data(x, price)
+        self.volume_line.set_data(x, volume)
+        target = mdates.date2num(pd.Timestamp(target_datetime).to_datetime64())
+        for line in self.target_lines:
+            line.set_xdata([target, target])
+        self.legend.get_texts()[1].set_text(target_label)
+        self.title.set_text(title)
+
+        for ax in (self.ax1, self.ax2):
+            ax.relim()
+            ax.autoscale_view()
+        self.ax1.set_xlim(x.min(), x.max())
+        with span("render.savefig"):
+            self.fig.savefig(path)
+
+
+_template = None
+
+
+def _init_worker():
+    global _template
+    _template = ChartTemplate()
+
+
+def _render_ticker(args):
+    ticker, ticker_posts, out_dir, fmt, cache_dir, max_points = args
+    cache = BarCache(cache_dir) if cache_dir else None
+    written = []
+    for post in ticker_posts.itertuples(index=False):
+        # Date is the GMT date, so posts after midnight GMT are on the previous exchange day
+        posted = pd.to_datetime(f"{post.Date} {post.GMT}", errors="coerce")
+        if pd.isna(posted):
+            written.append((ticker, post.Date, None, "bad timestamp"))
+            continue
+        posted = posted.tz_localize("UTC").tz_convert(EXCHANGE_TZ).tz_localize(None)
+        post_date = posted.date()
+        start_date = post_date - timedelta(days=1)
+        end_date = post_date + timedelta(days=1)
+        fetch_end = str(end_date + timedelta(days=1))
+        try:
+            if cache is not None:
+                minute_df = cache.get_bars(ticker, "1m", str(start_date), fetch_end)
+            else:
+                minute_df = download_bars(ticker, str(start_date), fetch_end, "1m")
+            day_df = window_bars(minute_df, start_date, end_date)
+        except Exception as e:
+            written.append((ticker, post.Date, None, f"error: {e!r}"))
+            continue
+
+        if day_df.empty:
+            written.append((ticker, post.Date, None, "no data"))
+            continue
+
+        path = os.path.join(out_dir, f"{ticker}_{posted:%Y-%m-%d_%H%M}.{fmt}")
+        _template.render(
+            day_df,
+            posted,
+            f"{ticker} Price and Volume around {posted:%Y-%m-%d %H:%M}",
+            f"Target Time ({posted:%Y-%m-%d %H:%M})",
+            path,
+            max_points=max_points,
+        )
+        written.append((ticker, post.Date, path, "ok"))
+    return written
+
+
+def render_posts(posts, out_dir="charts", fmt="png", processes=None, max_points=2000, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Render the analyse_stock chart for every post in parallel worker processes.
+
+    Parameters:
+    posts (DataFrame): Rows of discord_tickers.csv (Ticker, Date, GMT)
+    out_dir (str): Directory the charts are written to
+    fmt (str): 'png' or 'svg'
+    processes (int): Number of worker processes, defaults to the CPU count
+    max_points (int): Downsample each minute series to this many points, None to plot every bar
+    cache_dir (str): BarCache directory to fetch minute bars through, None to download directly
+
+    Returns:
+    DataFrame: Ticker, Date, path and status for every post
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(ticker, group, out_dir, fmt, cache_dir, max_points)
+            for ticker, group in posts.groupby("Ticker", sort=False)]
+    rows = []
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count(), initializer=_init_worker) as pool:
+        for written in pool.map(_render_ticker, jobs):
+            rows.extend(written)
+    return pd.DataFrame(rows, columns=["Ticker", "Date", "path", "status"])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render charts for every post in discord_tickers.csv")
+    parser.add_argument("--csv", default="discord_tickers.csv")
+    parser.add_argument("--out", default="charts")
+    parser.add_argument("--format", default="png", choices=["png", "svg"])
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--max-points", type=int, default=2000)
+    add_arguments(parser)
+    args = parser.parse_args()
+    from_args(args)
+
+    posts = pd.read_csv(args.csv)
+    results = render_posts(posts, args.out, args.format, args.processes, args.max_points or None)
+    print(results['status'].value_counts().to_string())
@@ -0,0 +1,137 @@
+from datetime import timezone
+from types import SimpleNamespace
+import pandas as pd
+
+
+class Event:
+    """Minimal stand-in for ib_insync's Event: handlers are added with += and called on emit."""
+
+    def __init__(self):
+        self.handlers = []
+
+    def __iadd__(self, handler):
+        self.handlers.append(handler)
+        return self
+
+    def __isub__(self, handler):
+        self.handlers.remove(handler)
+        return self
+
+    def emit(self, *args):
+        for handler in list(self.handlers):
+            handler(*args)
+
+
+class ReplayBarList(list):
+    """List of bars with an updateEvent, like ib_insync's BarDataList / RealTimeBarList."""
+
+    def __init__(self, contract, realtime):
+        super().__init__()
+        self.contract = contract
+        self.realtime = realtime
+        self.updateEvent = Event()
+
+
+def _bar(row, realtime):
+    # RealTimeBar uses open_ and time, BarData uses open and date
+    if realtime:
+        return SimpleNamespace(time=row.date.to_pydatetime().astimezone(timezone.utc), open_=row.open,
+                               high=row.high, low=row.low, close=row.close, volume=row.volume,
+                               wap=row.averageWAP, count=row.barCount)
+    return SimpleNamespace(date=row.date.to_pydatetime(), open=row.open, high=row.high, low=row.low,
+                           close=row.close, volume=row.volume, average=row.averageWAP,
+                           barCount=row.barCount)
+
+
+class ReplayIB:
+    """
+    Fake ib_insync.IB that replays recorded bars to subscribers.
+
+    Recorded bars are frames in the fetch_yfinance_data schema keyed by ticker.
+    Contracts only need a `symbol` attribute, so ib_insync.Stock objects or
+    SimpleNamespace(symbol=...) both work.
+    """
+
+    def __init__(self, recorded, history_bars=0):
+        """
+        Parameters:
+        recorded (dict): Ticker -> bars DataFrame to replay
+        history_bars (int): Number of leading bars returned as history by
+            keepUpToDate requests before the replay starts
+        """
+        self.recorded = {ticker.upper(): df.sort_values("date").reset_index(drop=True)
+                         for ticker, df in recorded.items()}
+        self.history_bars = history_bars
+        self.subscriptions = []
+        self.requests = []
+        self.connected = True
+
+    def isConnected(self):
+        return self.connected
+
+    async def connectAsync(self, host="127.0.0.1", port=7497, clientId=1, timeout=4):
+        self.connected = True
+        return self
+
+    async def reqHistoricalDataAsync(self, contract, endDateTime="", durationStr="1 D", barSizeSetting="1 min",
+                                     whatToShow="TRADES", useRTH=False, formatDate=1, keepUpToDate=False,
+                                     **kwargs):
+        """Return the recorded bars in (endDateTime - durationStr, endDateTime], like a one-shot IB request."""
+        self.requests.append((contract.symbol, endDateTime, durationStr, barSizeSetting, whatToShow, useRTH))
+        df = self.recorded.get(contract.symbol.upper(), pd.DataFrame())
+        if df.empty:
+            return ReplayBarList(contract, realtime=False)
+        end = pd.Timestamp(endDateTime) if endDateTime else df["date"].iloc[-1] + pd.Timedelta(seconds=1)
+        if end.tz is None:
+            end = end.tz_localize("UTC")
+        count, unit = durationStr.split()
+        unit_days = {"S": 1 / 86400, "D": 1, "W": 7, "M": 30, "Y": 365}[unit]
+        start = end - pd.Timedelta(days=int(count) * unit_days)
+        window = df[(df["date"] > start) & (df["date"] <= end)]
+        bars = ReplayBarList(contract, realtime=False)
+        bars.extend(_bar(row, False) for row in window.itertuples(index=False))
+        if barSizeSetting == "1 day":
+            for bar in bars:
+                bar.date = bar.date.date()
+        return bars
+
+    def disconnect(self):
+        self.connected = False
+
+    def reqHistoricalData(self, contract, endDateTime="", durationStr="1 D", barSizeSetting="1 min",
+                          whatToShow="TRADES", useRTH=False, formatDate=1, keepUpToDate=False, **kwargs):
+        df = self.recorded.get(contract.symbol.upper(), pd.DataFrame())
+        bars = ReplayBarList(contract, realtime=False)
+        history = df if not keepUpToDate else df.iloc[:self.history_bars]
+        bars.extend(_bar(row, False) for row in history.itertuples(index=False))
+        if keepUpToDate:
+            self.subscriptions.append((bars, df.iloc[self.history_bars:]))
+        return bars
+
+    def reqRealTimeBars(self, contract, barSize=5, whatToShow="TRADES", useRTH=False, **kwargs):
+        df = self.recorded.get(contract.symbol.upper(), pd.DataFrame())
+        bars = ReplayBarList(contract, realtime=True)
+        self.subscriptions.append((bars, df))
+        return bars
+
+    def cancelHistoricalData(self, bars):
+        self.subscriptions = [(b, df) for b, df in self.subscriptions if b is not bars]
+
+    def cancelRealTimeBars(self, bars):
+        self.cancelHistoricalData(bars)
+
+    def replay(self):
+        """
+        Feed every recorded bar to its subscribers in timestamp order across tickers.
+        keepUpToDate subscriptions get an update with hasNewBar=True for each bar,
+        the same way ib_insync reports a newly started bar.
+        """
+        pending = []
+        for bars, df in self.subscriptions:
+            for row in df.itertuples(index=False):
+                pending.append((row.date, id(bars), bars, row))
+        pending.sort(key=lambda item: (item[0], item[1]))
+
+        for _, _, bars, row in pending:
+            bars.append(_bar(row, bars.realtime))
+            bars.updateEvent.emit(bars, True)
@@ -0,0 +1,425 @@
+import json
+import sys
+import time
+import heapq
+import threading
+import instrument
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# Only the standard library (and instrument, which needs nothing else) is
+# imported at module level so the CLI client starts fast; pandas, yfinance
+# and the analysis modules are imported by the daemon when it starts.
+
+DEFAULT_HOST, DEFAULT_PORT = "127.0.0.1", 8765
+EXCHANGE = ZoneInfo("America/New_York")
+
+# Minute bars are fetched with pre and post market, so the session runs 04:00 - 20:00 ET
+SESSION_OPEN, SESSION_CLOSE = (4, 0), (20, 0)
+# Daily bars are refreshed once the regular session has closed and settled
+DAILY_REFRESH = (16, 30)
+# Seconds after the minute boundary before the finished bar is fetched
+BAR_DELAY = 5
+MINUTE_HISTORY_DAYS = 6
+
+
+def _at(day, hour_minute):
+    return datetime(day.year, day.month, day.day, *hour_minute, tzinfo=EXCHANGE)
+
+
+def is_trading_day(day, holidays=()):
+    return day.weekday() < 5 and day not in holidays
+
+
+def next_minute_refresh(now, holidays=()):
+    """Next time to fetch minute bars: BAR_DELAY seconds after the next minute in session, else the next open."""
+    local = now.astimezone(EXCHANGE)
+    candidate = local.replace(second=0, microsecond=0) + timedelta(minutes=1, seconds=BAR_DELAY)
+    day = candidate.date()
+    while True:
+        if is_trading_day(day, holidays):
+            open_, close = _at(day, SESSION_OPEN), _at(day, SESSION_CLOSE) + timedelta(seconds=BAR_DELAY)
+            if candidate <= close:
+                return max(candidate, open_ + timedelta(minutes=1, seconds=BAR_DELAY))
+        day += timedelta(days=1)
+        candidate = _at(day, SESSION_OPEN)
+
+
+def next_daily_refresh(now, holidays=()):
+    """Next DAILY_REFRESH time on a trading day after now."""
+    local = now.astimezone(EXCHANGE)
+    day = local.date()
+    while not (is_trading_day(day, holidays) and _at(day, DAILY_REFRESH) > local):
+        day += timedelta(days=1)
+    return _at(day, DAILY_REFRESH)
+
+
+def every(seconds):
+    return lambda now: now + timedelta(seconds=seconds)
+
+
+class Scheduler:
+    """
+    Runs named jobs at the times returned by their next-run functions, one at
+    a time on the calling thread. A failing job is logged and rescheduled.
+    """
+
+    def __init__(self, clock=lambda: datetime.now(timezone.utc)):
+        self.clock = clock
+        self.queue = []
+        self.log = []
+        self._counter = 0
+
+    def add(self, name, fn, next_run, run_now=False):
+        """
+        Parameters:
+        name (str): Job name for the log
+        fn (callable): Job to run, takes no arguments
+        next_run (callable): Current time -> time of the next run
+        run_now (bool): Also run once straight away
+        """
+        when = self.clock() if run_now else next_run(self.clock())
+        self._counter += 1
+        heapq.heappush(self.queue, (when, self._counter, name, fn, next_run))
+
+    def run_pending(self):
+        """Run every job that is due and return how long to sleep until the next one."""
+        while self.queue and self.queue[0][0] <= self.clock():
+            _, _, name, fn, next_run = heapq.heappop(self.queue)
+            started = time.perf_counter()
+            try:
+                with instrument.span(f"job.{name}"):
+                    fn()
+                error = None
+            except Exception as e:
+                error = repr(e)
+            self.log.append({"job": name, "at": self.clock().isoformat(), "seconds": time.perf_counter() - started,
+                             "error": error})
+            self.log = self.log[-100:]
+            self._counter += 1
+            heapq.heappush(self.queue, (next_run(self.clock()), self._counter, name, fn, next_run))
+        if not self.queue:
+            return 60.0
+        return max((self.queue[0][0] - self.clock()).total_seconds(), 0.0)
+
+    def run_forever(self, stop):
+        while not stop.is_set():
+            stop.wait(min(self.run_pending(), 1.0))
+
+    def upcoming(self):
+        return [{"job": name, "at": when.isoformat()} for when, _, name, _, _ in sorted(self.queue)]
+
+
+class ScannerState:
+    """
+    The watchlist's bars and trend matrix, kept in memory between requests.
+
+    Refresh jobs build new frames and swap them in under the lock, so queries
+    always see a complete snapshot.
+    """
+
+    def __init__(self, tickers, downloader=None, holidays=(), batch_size=20, max_workers=4):
+        """
+        Parameters:
+        tickers (list): Watchlist
+        downloader (callable): (tickers, start, end, interval) -> dict of bars,
+            data.download_bars_batch by default
+        holidays (set): Exchange holidays as dates
+        batch_size (int): Number of tickers per refresh request
+        max_workers (int): Number of refresh requests made at the same time
+        """
+        import pandas as pd
+        from data import download_bars_batch, fill_daily_from_minutes, empty_bars
+        from watchlist import WatchlistScanner
+
+        self.pd = pd
+        self.fill_daily_from_minutes = fill_daily_from_minutes
+        self.empty = empty_bars()
+        self.tickers = list(dict.fromkeys(tickers))
+        self.downloader = downloader or download_bars_batch
+        self.holidays = holidays
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.frames = {}
+        self.scanner = WatchlistScanner()
+        self.lock = threading.Lock()
+        self.refreshed = {}
+
+    def _today(self):
+        return datetime.now(EXCHANGE).date()
+
+    def load(self, tickers=None):
+        """Cold start of the given tickers, all by default: a year of daily bars and MINUTE_HISTORY_DAYS of minute bars."""
+        from data import fetch_many
+
+        end = self._today() + timedelta(days=1)
+        loaded, _ = fetch_many(tickers or self.tickers, str(end), batch_size=self.batch_size,
+                               max_workers=self.max_workers, downloader=self.downloader)
+        self._swap({**self.frames, **loaded})
+        self.refreshed["load"] = datetime.now(timezone.utc).isoformat()
+
+    def _download(self, starts, end, interval):
+        """
+        Download every ticker from its own start, batching tickers with
+        similar starts together. Each batch is requested from its earliest start.
+
+        Parameters:
+        starts (dict): Ticker -> start date or tz-aware timestamp
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        tickers = sorted(starts, key=lambda ticker: self.pd.Timestamp(starts[ticker]))
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+
+        def download(batch):
+            return self.downloader(batch, starts[batch[0]], end, interval)
+
+        bars = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for batch_bars in pool.map(download, batches):
+                bars.update(batch_bars)
+        return bars
+
+    def _merge(self, old, new, keep_after=None):
+        pd = self.pd
+        frames = [df for df in (old, new) if df is not None and not df.empty]
+        if not frames:
+            return old if old is not None else new
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset="date", keep="last").sort_values("date")
+        if keep_after is not None:
+            df = df[df["date"] >= pd.Timestamp(keep_after, tz=EXCHANGE.key)]
+        return df.reset_index(drop=True)
+
+    def refresh_minute(self):
+        """Fetch the minute bars since each ticker's last stored bar and rescore the tickers that changed."""
+        today = self._today()
+        midnight = self.pd.Timestamp(today, tz=EXCHANGE.key)
+        starts = {}
+        for ticker in self.tickers:
+            _, minute_df = self.frames.get(ticker, (None, None))
+            # The last stored bar may still have been forming, so it is fetched again
+            last = minute_df["date"].iat[-1] if minute_df is not None and len(minute_df) else midnight
+            starts[ticker] = max(last, midnight)
+        new = self._download(starts, str(today + timedelta(days=1)), "1m")
+        keep_after = today - timedelta(days=MINUTE_HISTORY_DAYS)
+        frames = dict(self.frames)
+        for ticker, minute_df in new.items():
+            daily_df, old_minute_df = frames.get(ticker, (None, None))
+            frames[ticker] = (daily_df, self._merge(old_minute_df, minute_df, keep_after))
+        self._swap(frames)
+        self.refreshed["minute"] = datetime.now(timezone.utc).isoformat()
+
+    def refresh_daily(self):
+        """Fetch the last week of daily bars to pick up today's final bar."""
+        today = self._today()
+        new = self._download(dict.fromkeys(self.tickers, str(today - timedelta(days=7))),
+                             str(today + timedelta(days=1)), "1d")
+        frames = dict(self.frames)
+        for ticker, daily_df in new.items():
+            old_daily_df, minute_df = frames.get(ticker, (None, None))
+            daily_df = self._merge(old_daily_df, daily_df)
+            if minute_df is not None and not minute_df.empty:
+                daily_df = self.fill_daily_from_minutes(daily_df, minute_df)
+            frames[ticker] = (daily_df, minute_df)
+        self._swap(frames)
+        self.refreshed["daily"] = datetime.now(timezone.utc).isoformat()
+
+    def _swap(self, frames):
+        empty = self.empty
+        complete = {ticker: (daily_df if daily_df is not None else empty, minute_df if minute_df is not None else empty)
+                    for ticker, (daily_df, minute_df) in frames.items()}
+        with self.lock:
+            self.scanner.update(complete)
+            self.frames = complete
+
+    def set_tickers(self, tickers):
+        tickers = list(dict.fromkeys(tickers))
+        added = [ticker for ticker in tickers if ticker not in self.frames]
+        with self.lock:
+            for ticker in set(self.frames) - set(tickers):
+                self.scanner.remove(ticker)
+                self.frames.pop(ticker)
+            self.tickers = tickers
+        return added
+
+    # Queries
+
+    def rank(self, by=None, top=20, ascending=False):
+        with self.lock:
+            ranked = self.scanner.rank(by, top, ascending)
+        return json.loads(ranked.reset_index().to_json(orient="records"))
+
+    def trends(self, ticker):
+        """Latest price and volume trends, labelled like watchlist.trend_matrix ('1m' month, '1m_min' minute)."""
+        from trends import compute_price_trends, compute_volume_trends, periods, _split_periods
+
+        daily_periods, _ = _split_periods(periods)
+        daily_labels = [label for label, _ in daily_periods]
+        # '1m' is both a month and a minute, so minute labels that clash get a suffix
+        labels = daily_labels + [f"{label}_min" if label in daily_labels else label
+                                 for label, _ in periods[len(daily_periods):]]
+        daily_df, minute_df = self.frames[ticker]
+        price = compute_price_trends(daily_df, minute_df, periods)
+        volume = compute_volume_trends(daily_df, minute_df, periods)
+        return {"ticker": ticker,
+                "price": {label: value for label, (_, value) in zip(labels, price)},
+                "volume": {label: value for label, (_, value) in zip(labels, volume)}}
+
+    def bars(self, ticker, interval="1m", tail=30):
+        daily_df, minute_df = self.frames[ticker]
+        df = (minute_df if interval == "1m" else daily_df).tail(tail)
+        return json.loads(df.to_json(orient="records", date_format="iso"))
+
+    def status(self):
+        return {"tickers": len(self.tickers), "loaded": len(self.frames), "refreshed": self.refreshed,
+                "minute_rows": int(sum(len(minute_df) for _, minute_df in self.frames.values()))}
+
+
+def _make_handler(state, scheduler):
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            payload = json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            parts = [part for part in url.path.split("/") if part]
+            started = time.perf_counter()
+            try:
+                if parts == ["status"]:
+                    body = {**state.status(), "jobs": scheduler.upcoming(), "log": scheduler.log[-10:]}
+                elif parts == ["rank"]:
+                    body = state.rank(query.get("by"), int(query.get("top", 20)), query.get("losers") == "1")
+                elif len(parts) == 2 and parts[0] == "trends":
+                    body = state.trends(parts[1].upper())
+                elif len(parts) == 2 and parts[0] == "bars":
+                    body = state.bars(parts[1].upper(), query.get("interval", "1m"), int(query.get("tail", 30)))
+                else:
+                    return self._send(404, {"error": f"unknown path {url.path}"})
+            except KeyError as e:
+                return self._send(404, {"error": f"unknown ticker {e}"})
+            except Exception as e:
+                return self._send(500, {"error": repr(e)})
+            self._send(200, {"ms": 1e3 * (time.perf_counter() - started), "result": body})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(tickers, host=DEFAULT_HOST, port=DEFAULT_PORT, csv_path=None, downloader=None, holidays=()):
+    """
+    Run the scanner: load the watchlist once, schedule the refresh jobs and
+    answer queries over HTTP until interrupted.
+
+    Parameters:
+    tickers (list): Watchlist, ignored when csv_path is given
+    host (str): Interface to listen on, localhost by default
+    port (int): Port to listen on
+    csv_path (str): discord_tickers.csv to take the watchlist from, re-read every 5 minutes
+    downloader (callable): (tickers, start, end, interval) -> dict of bars
+    holidays (set): Exchange holidays as dates
+    """
+    from http.server import ThreadingHTTPServer
+
+    def watchlist():
+        import pandas as pd
+        return pd.read_csv(csv_path)["Ticker"].dropna().unique().tolist()
+
+    state = ScannerState(watchlist() if csv_path else tickers, downloader, holidays)
+    state.load()
+
+    scheduler = Scheduler()
+    scheduler.add("minute", state.refresh_minute, lambda now: next_minute_refresh(now, holidays))
+    scheduler.add("daily", state.refresh_daily, lambda now: next_daily_refresh(now, holidays))
+    if csv_path:
+        def reload_watchlist():
+            added = state.set_tickers(watchlist())
+            if added:
+                state.load(added)
+        scheduler.add("watchlist", reload_watchlist, every(300))
+
+    server = ThreadingHTTPServer((host, port), _make_handler(state, scheduler))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Scanning {len(state.tickers)} tickers, listening on http://{host}:{port}", flush=True)
+
+    stop = threading.Event()
+    try:
+        scheduler.run_forever(stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+def query(path, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=5):
+    """GET a path from a running scanner and return the decoded JSON."""
+    from urllib.request import urlopen
+
+    with urlopen(f"http://{host}:{port}{path}", timeout=timeout) as response:
+        return json.load(response)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Long-running watchlist scanner and its client")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Start the scanner")
+    serve_parser.add_argument("tickers", nargs="*")
+    serve_parser.add_argument("--csv", default=None, help="Take the watchlist from a discord_tickers.csv")
+    instrument.add_arguments(serve_parser)
+
+    rank_parser = commands.add_parser("rank", help="Top movers")
+    rank_parser.add_argument("--by", default=None)
+    rank_parser.add_argument("--top", type=int, default=20)
+    rank_parser.add_argument("--losers", action="store_true")
+
+    commands.add_parser("trends", help="Price and volume trends of a ticker").add_argument("ticker")
+    bars_parser = commands.add_parser("bars", help="Latest bars of a ticker")
+    bars_parser.add_argument("ticker")
+    bars_parser.add_argument("--interval", default="1m", choices=["1m", "1d"])
+    bars_parser.add_argument("--tail", type=int, default=30)
+    commands.add_parser("status", help="Watchlist, refresh times and scheduled jobs")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        if not args.tickers and not args.csv:
+            parser.error("serve needs tickers or --csv")
+        instrument.from_args(args)
+        return serve(args.tickers, args.host, args.port, args.csv)
+
+    if args.command == "rank":
+        path = f"/rank?top={args.top}&losers={int(args.losers)}" + (f"&by={args.by}" if args.by else "")
+    elif args.command == "bars":
+        path = f"/bars/{args.ticker}?interval={args.interval}&tail={args.tail}"
+    elif args.command == "trends":
+        path = f"/trends/{args.ticker}"
+    else:
+        path = "/status"
+    from urllib.error import URLError, HTTPError
+
+    try:
+        response = query(path, args.host, args.port)
+    except HTTPError as e:
+        sys.exit(json.load(e).get("error", str(e)))
+    except URLError as e:
+        sys.exit(f"No scanner at http://{args.host}:{args.port} ({e.reason}), start one with: python scanner.py serve")
+    json.dump(response, sys.stdout, indent=2, default=str)
+    print()
+
+
+if __name__ == "__main__":
+    main()
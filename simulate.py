@@ -0,0 +1,206 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from trends import periods, rolling_trends, _split_periods, _sorted_values
+from data import epoch_ns
+
+
+def estimate_params(minute_df, at=None, lookback=390, periods=periods, trend_weight=0.5,
+                    ma_windows=(30, 60, 390), ma_weight=0.05, vol_window=30, vol_weight=0.5):
+    """
+    Estimate per-minute drift and volatility at a point in time, adjusted by
+    the minute trends from trends.py and by where the price sits against its
+    moving averages.
+
+    Parameters:
+    minute_df (DataFrame or Bars): Minute bars
+    at (Timestamp): Tz-aware time to start from, defaults to after the last bar
+    lookback (int): Number of bars used for the base drift and volatility
+    periods (list): (label, window) pairs, the minute periods are used as trendlines
+    trend_weight (float): How much of the average normalised trend is added to the drift
+    ma_windows (tuple): Moving average windows in bars
+    ma_weight (float): Drift tilt, in units of sigma, when the price is above all moving averages
+    vol_window (int): Recent bars used to scale the volatility
+    vol_weight (float): Exponent on recent / lookback volatility, 0 keeps the lookback volatility
+
+    Returns:
+    dict: start_price, mu, sigma (per-minute log-return) and slope (the 1h
+        trend in price per minute, used as the trendline)
+    """
+    dates, values = _sorted_values(minute_df, ["close"])
+    close = values[0]
+    if at is not None:
+        end = np.searchsorted(epoch_ns(pd.Series(dates)), pd.Timestamp(at).value, side="right")
+        close = close[:end]
+    if len(close) < 3:
+        raise ValueError("Not enough minute bars before the start time")
+
+    start_price = close[-1]
+    log_returns = np.diff(np.log(close[-(lookback + 1):]))
+    mu = log_returns.mean()
+    sigma = log_returns.std(ddof=1)
+
+    minute_periods = _split_periods(periods)[1]
+    windows = [window for _, window in minute_periods]
+    latest = rolling_trends(close[-(max(windows) + 1):], windows)[:, -1]
+    normalised = latest / start_price
+    if np.isfinite(normalised).any():
+        mu += trend_weight * np.nanmean(normalised)
+
+    above = [np.sign(start_price - close[-window:].mean()) for window in ma_windows if len(close) >= window]
+    if above:
+        mu += ma_weight * sigma * np.mean(above)
+
+    recent = log_returns[-vol_window:]
+    if len(recent) > 1 and sigma > 0:
+        sigma *= (recent.std(ddof=1) / sigma) ** vol_weight
+
+    # Trendline: the 1h trend if there is enough data, else the longest finite one
+    finite = [(window, trend) for window, trend in zip(windows, latest) if np.isfinite(trend)]
+    hourly = [trend for window, trend in finite if window == 60]
+    slope = hourly[0] if hourly else (max(finite)[1] if finite else 0.0)
+
+    return {"start_price": float(start_price), "mu": float(mu), "sigma": float(sigma), "slope": float(slope)}
+
+
+def simulate_paths(start_price, mu, sigma, n_paths=10000, n_steps=390, seed=None, chunk_size=5000,
+                   slope=0.0, break_band=0.05, break_drift=0.0, keep_paths=False):
+    """
+    Geometric Brownian motion Monte Carlo, generated chunk by chunk as a
+    paths x steps matrix so memory stays bounded by chunk_size x n_steps.
+
+    A path that closes more than break_band below the trendline
+    start_price + slope * t has break_drift added to its drift for every
+    step after the break.
+
+    Parameters:
+    start_price (float): Price at step 0
+    mu (float): Per-step log-return drift
+    sigma (float): Per-step log-return volatility
+    n_paths (int): Number of paths
+    n_steps (int): Number of steps (minutes) per path
+    seed (int or SeedSequence): Seed for numpy's Generator
+    chunk_size (int): Paths generated per chunk
+    slope (float): Trendline slope in price per step
+    break_band (float): Fraction below the trendline that counts as a break
+    break_drift (float): Extra per-step drift after a break, usually negative
+    keep_paths (bool): Also return the full float32 paths matrix
+
+    Returns:
+    dict: terminal prices, per-step mean and std of the price, the share of
+        paths that broke the trendline, and the paths when keep_paths is set
+    """
+    rng = np.random.default_rng(seed)
+    steps = np.arange(1, n_steps + 1)
+    trendline = (start_price + slope * steps) * (1 - break_band)
+
+    terminal = np.empty(n_paths, dtype=np.float64)
+    total = np.zeros(n_steps)
+    total_sq = np.zeros(n_steps)
+    broke = 0
+    paths = np.empty((n_paths, n_steps), dtype=np.float32) if keep_paths else None
+
+    drift = mu - 0.5 * sigma ** 2
+    for start in range(0, n_paths, chunk_size):
+        size = min(chunk_size, n_paths - start)
+        log_paths = np.cumsum(drift + sigma * rng.standard_normal((size, n_steps)), axis=1)
+        prices = start_price * np.exp(log_paths)
+
+        below = prices < trendline
+        has_break = below.any(axis=1)
+        broke += int(has_break.sum())
+        if break_drift:
+            first = np.where(has_break, below.argmax(axis=1), n_steps)
+            # Steps since the break, 0 up to and including the break bar
+            since = np.clip(steps[None, :] - 1 - first[:, None], 0, None)
+            prices *= np.exp(break_drift * since)
+
+        terminal[start:start + size] = prices[:, -1]
+        total += prices.sum(axis=0)
+        total_sq += np.square(prices).sum(axis=0)
+        if keep_paths:
+            paths[start:start + size] = prices
+
+    mean = total / n_paths
+    result = {
+        "terminal": terminal,
+        "mean": mean,
+        "std": np.sqrt(np.maximum(total_sq / n_paths - mean ** 2, 0)),
+        "break_probability": broke / n_paths,
+    }
+    if keep_paths:
+        result["paths"] = paths
+    return result
+
+
+def simulate(minute_df, at=None, n_paths=10000, n_steps=390, seed=None, chunk_size=5000,
+             break_band=0.05, break_drift=0.0, keep_paths=False, **param_kwargs):
+    """
+    Estimate the parameters from the minute bars and run the simulation.
+
+    Returns:
+    dict: The simulate_paths result plus the estimated parameters under 'params'
+    """
+    params = estimate_params(minute_df, at, **param_kwargs)
+    result = simulate_paths(
+        params["start_price"], params["mu"], params["sigma"], n_paths, n_steps, seed, chunk_size,
+        params["slope"], break_band, break_drift, keep_paths,
+    )
+    result["params"] = params
+    return result
+
+
+def summarise(result, targets=(0.1, 0.2, -0.1)):
+    """
+    Percentiles of the terminal price and the probability of finishing past
+    each target return.
+    """
+    start_price = result["params"]["start_price"]
+    terminal = result["terminal"]
+    summary = {f"p{q}": float(np.percentile(terminal, q)) for q in (5, 25, 50, 75, 95)}
+    for target in targets:
+        level = start_price * (1 + target)
+        summary[f"prob_{target:+.0%}"] = float((terminal >= level).mean() if target >= 0 else (terminal <= level).mean())
+    summary["break_probability"] = result["break_probability"]
+    return summary
+
+
+def _simulate_ticker(args):
+    ticker, minute_df, at, seed, kwargs = args
+    try:
+        return ticker, summarise(simulate(minute_df, at, seed=seed, **kwargs))
+    except ValueError as e:
+        return ticker, {"error": str(e)}
+
+
+def simulate_many(jobs, processes=None, seed=None, **kwargs):
+    """
+    Simulate several tickers across a process pool with independent random streams.
+
+    Parameters:
+    jobs (dict): Ticker -> (minute_df, at)
+    processes (int): Number of worker processes, defaults to the CPU count
+    seed (int): Root seed, each ticker gets its own child SeedSequence
+    **kwargs: Passed on to simulate
+
+    Returns:
+    DataFrame: summarise() output per ticker
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(jobs))
+    args = [(ticker, minute_df, at, child, kwargs)
+            for (ticker, (minute_df, at)), child in zip(jobs.items(), seeds)]
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        results = dict(pool.map(_simulate_ticker, args))
+    return pd.DataFrame.from_dict(results, orient="index")
+
+
+if __name__ == "__main__":
+    from data import fetch_yfinance_data
+    from cache import BarCache
+
+    stock = "OKYO"
+    daily_df, minute_df = fetch_yfinance_data(stock, "2025-06-21", cache=BarCache())
+    result = simulate(minute_df, n_paths=20000, n_steps=390, seed=0, break_drift=-0.0005)
+    print(result["params"])
+    print(summarise(result))
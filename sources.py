@@ -0,0 +1,189 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from data import (download_bars, resample_bars, daily_from_minutes, epoch_ns, empty_bars, BAR_COLUMNS,
+                  EXCHANGE_TZ, RESAMPLE_RULES)
+
+# Every backend is an object with get_bars(ticker, interval, start, end) returning
+# a frame with BAR_COLUMNS for start (inclusive) to end (exclusive). BarCache and
+# ibkr.IBKRDataSource already have it; the two below cover yfinance and replay.
+
+
+class YFinanceSource:
+    """yfinance downloads behind the get_bars interface."""
+
+    def get_bars(self, ticker, interval, start, end):
+        if interval in RESAMPLE_RULES:
+            return resample_bars(download_bars(ticker, start, end, "1m"), interval)
+        return download_bars(ticker, start, end, interval)
+
+
+class ReplaySource:
+    """
+    Serves recorded bars from memory, for tests and offline runs.
+
+    Daily bars are aggregated from the minute bars for tickers that have no
+    recorded daily bars, and RESAMPLE_RULES intervals are resampled from them.
+    """
+
+    def __init__(self, minute=None, daily=None, exchange_tz=EXCHANGE_TZ):
+        """
+        Parameters:
+        minute (dict): Ticker -> minute bars frame
+        daily (dict): Ticker -> daily bars frame
+        exchange_tz (str): Timezone the start and end dates are in
+        """
+        self.frames = {"1m": {}, "1d": {}}
+        for interval, recorded in (("1m", minute or {}), ("1d", daily or {})):
+            for ticker, df in recorded.items():
+                self.frames[interval][ticker.upper()] = df.sort_values("date").reset_index(drop=True)
+        for ticker, df in self.frames["1m"].items():
+            if ticker not in self.frames["1d"]:
+                self.frames["1d"][ticker] = daily_from_minutes(df, exchange_tz).reset_index(drop=True)
+        self.exchange_tz = exchange_tz
+
+    def get_bars(self, ticker, interval, start, end):
+        if interval in RESAMPLE_RULES:
+            return resample_bars(self.get_bars(ticker, "1m", start, end), interval, self.exchange_tz)
+        if interval not in self.frames:
+            raise ValueError(f"Unsupported interval: {interval}")
+        df = self.frames[interval].get(ticker.upper())
+        if df is None or df.empty:
+            return empty_bars(self.exchange_tz)
+        times = epoch_ns(df["date"])
+        lo, hi = np.searchsorted(times, [pd.Timestamp(start, tz=self.exchange_tz).value,
+                                         pd.Timestamp(end, tz=self.exchange_tz).value])
+        return df.iloc[lo:hi].reset_index(drop=True)
+
+
+class DataRouter:
+    """
+    Routes get_bars calls across interchangeable backends.
+
+    Backends are tried fastest first by their moving average latency. A call
+    that errors, returns no bars or runs past the backend's timeout falls
+    through to the next backend and counts as taking the full timeout, so a
+    slow or failing backend sinks to the back of the order. It is tried first
+    again after probe_interval seconds so it can recover once the provider is
+    healthy.
+
+    Every backend has its own threads and a limit on calls in flight, so
+    calls stuck on a hung provider cannot hold up the other backends; once
+    the limit is reached the hung backend is skipped straight away.
+    """
+
+    def __init__(self, backends, timeouts=None, default_timeout=10.0, probe_interval=300.0, alpha=0.2,
+                 max_workers=8, clock=time.monotonic):
+        """
+        Parameters:
+        backends (list): (name, source) pairs in order of preference for untried backends
+        timeouts (dict): Name -> seconds to wait for that backend
+        default_timeout (float): Seconds to wait for backends without a timeout
+        probe_interval (float): Seconds after which an unused backend is tried first again
+        alpha (float): Weight of the newest call in the moving average latency
+        max_workers (int): Threads and calls in flight per backend, so a timed out call does not block the caller
+        """
+        self.backends = list(backends)
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.probe_interval = probe_interval
+        self.alpha = alpha
+        self.clock = clock
+        self.pools = {name: ThreadPoolExecutor(max_workers=max_workers) for name, _ in self.backends}
+        self.slots = {name: threading.BoundedSemaphore(max_workers) for name, _ in self.backends}
+        self.lock = threading.Lock()
+        self.stats = {name: {"calls": 0, "served": 0, "empty": 0, "timeouts": 0, "errors": 0, "busy": 0,
+                             "latency": None, "last_used": None} for name, _ in self.backends}
+
+    def _record(self, name, latency, outcome):
+        with self.lock:
+            stats = self.stats[name]
+            stats["calls"] += 1
+            stats[outcome] += 1
+            stats["latency"] = latency if stats["latency"] is None else \
+                (1 - self.alpha) * stats["latency"] + self.alpha * latency
+            stats["last_used"] = self.clock()
+
+    def order(self):
+        """Backend names in the order the next call tries them."""
+        now = self.clock()
+
+        def score(item):
+            stats = self.stats[item[1][0]]
+            if stats["latency"] is None or now - stats["last_used"] > self.probe_interval:
+                return (0, 0.0, item[0])
+            return (1, stats["latency"], item[0])
+
+        return [name for _, (name, _) in sorted(enumerate(self.backends), key=score)]
+
+    def get_bars(self, ticker, interval, start, end):
+        """
+        Return the bars from the first backend that answers in time with data.
+
+        Returns:
+        DataFrame: Bars with BAR_COLUMNS, empty if every backend returned no bars
+
+        Raises:
+        RuntimeError: If every backend failed or timed out
+        """
+        sources = dict(self.backends)
+        errors = {}
+        any_empty = False
+        for name in self.order():
+            timeout = self.timeouts.get(name, self.default_timeout)
+            if not self.slots[name].acquire(blocking=False):
+                # Every thread of this backend is still waiting on earlier calls
+                self._record(name, timeout, "busy")
+                errors[name] = "too many calls in flight"
+                continue
+            started = self.clock()
+            future = self.pools[name].submit(sources[name].get_bars, ticker, interval, start, end)
+            future.add_done_callback(lambda _, slot=self.slots[name]: slot.release())
+            try:
+                df = future.result(timeout=timeout)
+            except TimeoutError:
+                # The call keeps running on its thread, the caller moves on
+                self._record(name, timeout, "timeouts")
+                errors[name] = f"timed out after {timeout}s"
+                continue
+            except Exception as e:
+                self._record(name, timeout, "errors")
+                errors[name] = repr(e)
+                continue
+            if df is None or df.empty:
+                self._record(name, timeout, "empty")
+                any_empty = True
+                continue
+            self._record(name, self.clock() - started, "served")
+            return df
+        if any_empty:
+            return empty_bars()
+        raise RuntimeError(f"No data source could serve {ticker} {interval} {start} - {end}: {errors}")
+
+    def download(self, ticker, start, end, interval):
+        """get_bars with download_bars' argument order, so the router can be a BarCache downloader."""
+        return self.get_bars(ticker, interval, start, end)
+
+    def report(self):
+        """Per-backend call counts and moving average latency in seconds."""
+        return pd.DataFrame.from_dict(self.stats, orient="index").drop(columns="last_used")
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    from cache import BarCache
+    from data import fetch_yfinance_data
+    from ibkr import IBKRDataSource
+
+    router = DataRouter([("yfinance", YFinanceSource()), ("ibkr", IBKRDataSource())],
+                        timeouts={"yfinance": 15.0, "ibkr": 30.0})
+    cache = BarCache(downloader=router.download)
+    daily_df, minute_df = fetch_yfinance_data("GME", "2025-06-09", source=cache)
+    print(minute_df.tail())
+    print(router.report())
+    router.close()
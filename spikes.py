@@ -0,0 +1,135 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from data import download_bars, epoch_ns
+from cache import BarCache, DEFAULT_CACHE_DIR
+
+RESULT_COLUMNS = [
+    "Ticker", "Date", "GMT", "status", "pre_bars", "pre_volume", "baseline_volume_mean",
+    "volume_z", "max_bar_z", "minutes_to_spike", "pre_price_change", "post_volume_ratio",
+]
+
+
+def load_posts(csv_path='discord_tickers.csv'):
+    """
+    Load the Discord posts with a UTC post timestamp per row.
+
+    Returns:
+    DataFrame: The CSV rows with an extra 'posted' column
+    """
+    posts = pd.read_csv(csv_path)
+    # Unparsable timestamps become NaT and are reported per row by the scans
+    posts['posted'] = pd.to_datetime(posts['Date'] + ' ' + posts['GMT'], errors='coerce').dt.tz_localize('UTC')
+    return posts
+
+
+def spike_metrics(minute_df, posted, pre_minutes=30, baseline_minutes=390, post_minutes=30, spike_z=3.0):
+    """
+    Measure how unusual the volume was in the minutes before a post.
+
+    The pre window is the pre_minutes of bars before the post, the baseline is
+    the baseline_minutes of bars before that. Bars are counted rather than
+    wall-clock minutes so overnight gaps do not empty the windows.
+
+    Parameters:
+    minute_df (DataFrame): Minute bars of the ticker
+    posted (Timestamp): Tz-aware post time
+    pre_minutes (int): Number of bars before the post to test
+    baseline_minutes (int): Number of bars before the pre window used as the baseline
+    post_minutes (int): Number of bars after the post compared to the pre window
+    spike_z (float): Per-bar z-score that counts as a spike
+
+    Returns:
+    dict: Spike metrics, with status 'ok' or the reason they could not be computed
+    """
+    if minute_df.empty:
+        return {"status": "no data"}
+
+    minute_df = minute_df.sort_values("date")
+    times = epoch_ns(minute_df["date"])
+    volume = minute_df["volume"].to_numpy(dtype=np.float64)
+    close = minute_df["close"].to_numpy(dtype=np.float64)
+
+    posted_ns = pd.Timestamp(posted).tz_convert("UTC").value
+    post_idx = np.searchsorted(times, posted_ns, side="left")
+    pre_start = max(post_idx - pre_minutes, 0)
+    base_start = max(pre_start - baseline_minutes, 0)
+
+    pre = volume[pre_start:post_idx]
+    baseline = volume[base_start:pre_start]
+    if len(pre) == 0 or len(baseline) < 2:
+        return {"status": "not enough bars"}
+
+    mean, std = baseline.mean(), baseline.std(ddof=1)
+    if std == 0:
+        std = np.nan
+    bar_z = (pre - mean) / std
+    spikes = np.flatnonzero(bar_z >= spike_z)
+    post = volume[post_idx:post_idx + post_minutes]
+
+    return {
+        "status": "ok",
+        "pre_bars": len(pre),
+        "pre_volume": pre.sum(),
+        "baseline_volume_mean": mean,
+        "volume_z": (pre.mean() - mean) / (std / np.sqrt(len(pre))),
+        "max_bar_z": np.nanmax(bar_z) if not np.isnan(std) else np.nan,
+        # How many minutes before the post the first spike bar happened
+        "minutes_to_spike": (posted_ns - times[pre_start + spikes[0]]) / 60e9 if len(spikes) else np.nan,
+        "pre_price_change": close[post_idx - 1] / close[pre_start] - 1 if close[pre_start] else np.nan,
+        "post_volume_ratio": post.mean() / pre.mean() if len(post) and pre.mean() else np.nan,
+    }
+
+
+def _scan_ticker(args):
+    ticker, ticker_posts, cache_dir, kwargs = args
+    cache = BarCache(cache_dir) if cache_dir else None
+    rows = []
+    for post in ticker_posts.itertuples(index=False):
+        if pd.isna(post.posted):
+            rows.append({"Ticker": ticker, "Date": post.Date, "GMT": post.GMT, "status": "bad timestamp"})
+            continue
+        start = (post.posted - timedelta(days=3)).strftime('%Y-%m-%d')
+        end = (post.posted + timedelta(days=1)).strftime('%Y-%m-%d')
+        try:
+            if cache is not None:
+                minute_df = cache.get_bars(ticker, "1m", start, end)
+            else:
+                minute_df = download_bars(ticker, start, end, "1m")
+            metrics = spike_metrics(minute_df, post.posted, **kwargs)
+        except Exception as e:
+            metrics = {"status": f"error: {e!r}"}
+        rows.append({"Ticker": ticker, "Date": post.Date, "GMT": post.GMT, **metrics})
+    return rows
+
+
+def scan_posts(posts, cache_dir=DEFAULT_CACHE_DIR, processes=None, **kwargs):
+    """
+    Compute spike metrics for every post, one worker process per ticker group.
+
+    Parameters:
+    posts (DataFrame): Posts from load_posts
+    cache_dir (str): BarCache directory to fetch minute bars through, None to download directly
+    processes (int): Number of worker processes, defaults to the CPU count
+    **kwargs: Passed on to spike_metrics
+
+    Returns:
+    DataFrame: One row of metrics per post with RESULT_COLUMNS
+    """
+    jobs = [(ticker, group, cache_dir, kwargs) for ticker, group in posts.groupby("Ticker", sort=False)]
+    rows = []
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        for ticker_rows in pool.map(_scan_ticker, jobs):
+            rows.extend(ticker_rows)
+    return pd.DataFrame(rows).reindex(columns=RESULT_COLUMNS)
+
+
+if __name__ == "__main__":
+    posts = load_posts('discord_tickers.csv')
+    results = scan_posts(posts)
+    results.to_csv('spike_scan.csv', index=False)
+    ok = results[results['status'] == 'ok']
+    print(f"Scanned {len(results)} posts, {len(ok)} with minute data")
+    print(ok.sort_values('volume_z', ascending=False).head(20).to_string(index=False))
@@ -0,0 +1,185 @@
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from trends import periods, _split_periods
+
+
+class TrendBuffer:
+    """
+    Fixed-size ring buffer of the last bars for one ticker.
+
+    Holds max(window) + 1 values per column, so each new bar updates the
+    trend of every window in O(1) without keeping the full history.
+    """
+
+    def __init__(self, windows, columns):
+        self.windows = np.asarray(windows, dtype=np.int64)
+        self.columns = list(columns)
+        self.capacity = int(self.windows.max()) + 1 if len(self.windows) else 1
+        self.values = np.full((len(self.columns), self.capacity), np.nan)
+        self.trends = np.full((len(self.columns), len(self.windows)), np.nan)
+        self.count = 0
+        self.last_time = None
+
+    def push(self, row, bar_time=None):
+        """
+        Add one bar and update all trends.
+
+        Parameters:
+        row (array): Values for self.columns in order
+        bar_time: Timestamp of the bar
+        """
+        pos = self.count % self.capacity
+        self.values[:, pos] = row
+        lagged = (pos - self.windows) % self.capacity
+        self.trends = (self.values[:, pos, None] - self.values[:, lagged]) / self.windows
+        self.trends[:, self.windows >= self.count + 1] = np.nan
+        self.count += 1
+        self.last_time = bar_time
+
+    def seed(self, df):
+        """Fill the buffer from the tail of a bars frame without replaying every bar."""
+        df = df.sort_values("date").tail(self.capacity)
+        for row, bar_time in zip(df[self.columns].to_numpy(dtype=np.float64), df["date"]):
+            self.push(row, bar_time)
+
+
+class StreamingTrends:
+    """
+    Keeps the minute period trends of every subscribed ticker up to date from
+    IB bar updates, using one TrendBuffer per ticker.
+    """
+
+    def __init__(self, periods=periods, columns=("close", "volume"), latency_window=10000):
+        """
+        Parameters:
+        periods (list): (label, window) pairs, only the minute periods are streamed
+        columns (tuple): Bar columns to track
+        latency_window (int): Number of recent per-bar update latencies kept
+        """
+        self.periods = _split_periods(periods)[1]
+        self.windows = [window for _, window in self.periods]
+        self.columns = list(columns)
+        self.buffers = {}
+        self.latencies = deque(maxlen=latency_window)
+        self.subscriptions = {}
+        self._partial = {}
+
+    def _buffer(self, ticker):
+        if ticker not in self.buffers:
+            self.buffers[ticker] = TrendBuffer(self.windows, self.columns)
+        return self.buffers[ticker]
+
+    def seed(self, ticker, minute_df):
+        self._buffer(ticker).seed(minute_df)
+
+    def on_bar(self, ticker, bar_time, values):
+        """
+        Push one completed minute bar for a ticker.
+
+        Parameters:
+        ticker (str): The stock ticker symbol
+        bar_time: Timestamp of the bar
+        values (dict): Column -> value for the bar
+
+        Returns:
+        ndarray: Column x window array of the latest trends
+        """
+        started = time.perf_counter()
+        buffer = self._buffer(ticker)
+        buffer.push([values[column] for column in self.columns], bar_time)
+        self.latencies.append(time.perf_counter() - started)
+        return buffer.trends
+
+    def latest(self, ticker, column="close"):
+        """Latest trends in the same (label, trend) format as compute_price_trends."""
+        buffer = self.buffers.get(ticker)
+        if buffer is None:
+            return [(label, None) for label, _ in self.periods]
+        row = buffer.trends[self.columns.index(column)]
+        return [(label, None if np.isnan(trend) else float(trend)) for (label, _), trend in zip(self.periods, row)]
+
+    def latency_stats(self):
+        """Per-bar update latency in microseconds."""
+        if not self.latencies:
+            return {"bars": 0}
+        lat = np.array(self.latencies) * 1e6
+        return {
+            "bars": len(lat),
+            "mean_us": float(lat.mean()),
+            "p50_us": float(np.percentile(lat, 50)),
+            "p99_us": float(np.percentile(lat, 99)),
+            "max_us": float(lat.max()),
+        }
+
+    def _on_history_update(self, bars, hasNewBar):
+        # With keepUpToDate the last bar is still forming, so the bar before it just completed
+        if not hasNewBar or len(bars) < 2:
+            return
+        bar = bars[-2]
+        self.on_bar(bars.contract.symbol, bar.date, {"open": bar.open, "high": bar.high, "low": bar.low,
+                                                     "close": bar.close, "volume": bar.volume})
+
+    def _on_realtime_update(self, bars, hasNewBar):
+        # Real-time bars arrive every 5 seconds, roll them up into minute bars
+        bar = bars[-1]
+        ticker = bars.contract.symbol
+        minute = pd.Timestamp(bar.time).floor("min")
+        partial = self._partial.get(ticker)
+        if partial is not None and partial["date"] != minute:
+            self.on_bar(ticker, partial["date"], partial)
+            partial = None
+        if partial is None:
+            self._partial[ticker] = {"date": minute, "open": bar.open_, "high": bar.high, "low": bar.low,
+                                     "close": bar.close, "volume": bar.volume}
+        else:
+            partial["high"] = max(partial["high"], bar.high)
+            partial["low"] = min(partial["low"], bar.low)
+            partial["close"] = bar.close
+            partial["volume"] += bar.volume
+
+    def subscribe(self, ib, contract, realtime=False):
+        """
+        Subscribe to live bars for a contract.
+
+        Parameters:
+        ib (IB): Connected ib_insync.IB, or a ReplayIB for testing
+        contract (Contract): Contract to stream, its symbol is used as the ticker
+        realtime (bool): Use 5 second reqRealTimeBars instead of keepUpToDate 1 minute bars
+        """
+        if realtime:
+            bars = ib.reqRealTimeBars(contract, 5, "TRADES", False)
+            bars.updateEvent += self._on_realtime_update
+        else:
+            bars = ib.reqHistoricalData(contract, endDateTime="", durationStr="1 D", barSizeSetting="1 min",
+                                        whatToShow="TRADES", useRTH=False, keepUpToDate=True)
+            history = [(bar.date, bar.open, bar.high, bar.low, bar.close, bar.volume) for bar in bars[:-1]]
+            if history:
+                self.seed(contract.symbol, pd.DataFrame(history, columns=["date", "open", "high", "low", "close", "volume"]))
+            bars.updateEvent += self._on_history_update
+        self.subscriptions[contract.symbol] = (bars, realtime)
+        return bars
+
+    def unsubscribe(self, ib, ticker):
+        bars, realtime = self.subscriptions.pop(ticker)
+        if realtime:
+            ib.cancelRealTimeBars(bars)
+        else:
+            ib.cancelHistoricalData(bars)
+
+
+if __name__ == "__main__":
+    from ib_insync import IB, Stock
+
+    ib = IB()
+    ib.connect(host='172.21.224.1', port=7497, clientId=206, timeout=10)
+    stream = StreamingTrends()
+    stream.subscribe(ib, Stock("GME", "SMART", "USD"))
+    try:
+        while True:
+            ib.sleep(60)
+            print(stream.latest("GME"))
+            print(stream.latency_stats())
+    except KeyboardInterrupt:
+        ib.disconnect()
@@ -1,6 +1,10 @@
+import numpy as np
 import pandas as pd
 from data import fetch_yfinance_data
+from cache import BarCache
+from bars import Bars
 from tabulate import tabulate
+from instrument import span, traced
 import warnings
 
 warnings.filterwarnings("ignore", category=FutureWarning, module="tabulate")
@@ -23,61 +27,113 @@ periods = [
     ]
 
 
+def rolling_trends(values, windows):
+    """
+    Compute (x[t] - x[t-w]) / w for every window and every bar in one vectorised call.
+
+    Parameters:
+    values (array): 1D series over time, or a 2D ticker x time (or column x time) matrix
+    windows (list): Window lengths in bars
+
+    Returns:
+    ndarray: Array of shape values.shape[:-1] + (len(windows), time), NaN where
+        there are not enough bars for the window
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    windows = np.asarray(windows, dtype=np.int64)
+    n = values.shape[-1]
+
+    lagged = np.arange(n)[None, :] - windows[:, None]
+    valid = lagged >= 0
+    shifted = values[..., np.clip(lagged, 0, None)]
+    trends = (values[..., None, :] - shifted) / windows[:, None]
+    trends[..., ~valid] = np.nan
+    return trends
+
+
+def _split_periods(periods):
+    # The first six periods are in trading days, the rest are in minutes
+    return periods[:6], periods[6:]
+
+
+def _sorted_values(bars, columns):
+    # Accepts a bars DataFrame or a Bars container, which is already sorted by date
+    if isinstance(bars, Bars):
+        dates = pd.to_datetime(bars["date"], unit="ns", utc=True).tz_convert(bars.tz)
+        values = np.vstack([bars[column].astype(np.float64) for column in columns])
+        return dates, values
+    with span("trends.sort"):
+        bars = bars.sort_values("date")
+    return pd.DatetimeIndex(bars["date"]), bars[list(columns)].to_numpy(dtype=np.float64).T
+
+
+def _trend_frame(df, periods, columns):
+    dates, values = _sorted_values(df, columns)
+    trends = rolling_trends(values, [window for _, window in periods])
+    out = pd.DataFrame({"date": dates})
+    for i, column in enumerate(columns):
+        for j, (label, _) in enumerate(periods):
+            out[f"{column}_{label}"] = trends[i, j]
+    return out
+
+
+@traced("trends.compute")
+def compute_trends(daily_df, minute_df, periods, columns=("close", "volume")):
+    """
+    Compute the full trend time series for every period and column.
+
+    Parameters:
+    daily_df (DataFrame or Bars): Daily bars
+    minute_df (DataFrame or Bars): Minute bars
+    periods (list): (label, window) pairs, daily periods first
+    columns (tuple): Bar columns to compute trends for
+
+    Returns:
+    tuple: Daily and minute DataFrames with a date column and one
+        '<column>_<label>' column per column and period
+    """
+    daily_periods, minute_periods = _split_periods(periods)
+    return _trend_frame(daily_df, daily_periods, columns), _trend_frame(minute_df, minute_periods, columns)
+
+
+@traced("trends.latest")
+def _latest_trends(daily_df, minute_df, periods, column):
+    trends = []
+    for df, frame_periods in zip((daily_df, minute_df), _split_periods(periods)):
+        windows = [window for _, window in frame_periods]
+        # Only the tail is needed for the latest bar
+        values = _sorted_values(df, [column])[1][0][-(max(windows, default=0) + 1):]
+        latest = rolling_trends(values, windows)[:, -1] if len(values) else []
+        for i, (label, _) in enumerate(frame_periods):
+            trend = latest[i] if len(values) and not np.isnan(latest[i]) else None
+            trends.append((label, None if trend is None else float(trend)))
+    return trends
+
+
 def compute_price_trends(daily_df, minute_df, periods):
-    # Define periods in minutes and days
-    
-    price_trends = []
-
-    # For daily periods
-    daily_close = daily_df.sort_values("date")["close"].reset_index(drop=True)
-    for label, window in periods[:6]:
-        if len(daily_close) >= window + 1:
-            price_trend = float(daily_close.iloc[-1] - daily_close.iloc[-window-1]) / window
-        else:
-            price_trend = None
-        if isinstance(price_trend, pd.Series) and len(price_trend) == 1:
-            price_trend = price_trend.iloc[0]
-        price_trends.append((label, price_trend))
-
-    # For intraday periods (minute_df)
-    minute_close = minute_df.sort_values("date")["close"].reset_index(drop=True)
-    for label, window in periods[6:]:
-        if len(minute_close) >= window + 1:
-            price_trend = float(minute_close.iloc[-1] - minute_close.iloc[-window-1]) / window
-        else:
-            price_trend = None
-        if isinstance(price_trend, pd.Series) and len(price_trend) == 1:
-            price_trend = price_trend.iloc[0]
-        price_trends.append((label, price_trend))
-
-    return price_trends
+    return _latest_trends(daily_df, minute_df, periods, "close")
+
 
 def compute_volume_trends(daily_df, minute_df, periods):
-    volume_trends = []
-
-    # For daily periods
-    daily_volume = daily_df.sort_values("date")["volume"].reset_index(drop=True)
-    for label, window in periods[:6]:
-        if len(daily_volume) >= window + 1:
-            volume_trend = float(daily_volume.iloc[-1] - daily_volume.iloc[-window-1]) / window
-        else:
-            volume_trend = None
-        if isinstance(volume_trend, pd.Series) and len(volume_trend) == 1:
-            volume_trend = volume_trend.iloc[0]
-        volume_trends.append((label, volume_trend))
-
-    # For intraday periods (minute_df)
-    minute_volume = minute_df.sort_values("date")["volume"].reset_index(drop=True)
-    for label, window in periods[6:]:
-        if len(minute_volume) >= window + 1:
-            volume_trend = float(minute_volume.iloc[-1] - minute_volume.iloc[-window-1]) / window
-        else:
-            volume_trend = None
-        if isinstance(volume_trend, pd.Series) and len(volume_trend) == 1:
-            volume_trend = volume_trend.iloc[0]
-        volume_trends.append((label, volume_trend))
-
-    return volume_trends
+    return _latest_trends(daily_df, minute_df, periods, "volume")
+
+
+def bars_matrix(frames, column):
+    """
+    Align one column of several tickers' bars into a ticker x time matrix.
+
+    Parameters:
+    frames (dict): Ticker -> bars DataFrame
+    column (str): Bar column to take, e.g. 'close'
+
+    Returns:
+    tuple: (tickers, dates, matrix) where missing bars are forward filled and
+        bars before a ticker's first bar are NaN
+    """
+    wide = pd.concat(
+        {ticker: df.set_index("date")[column] for ticker, df in frames.items()}, axis=1
+    ).sort_index().ffill()
+    return list(wide.columns), wide.index, wide.to_numpy(dtype=np.float64).T
 
 
 def display_trends_table(stock, trends):
@@ -89,7 +145,7 @@ def display_trends_table(stock, trends):
 
 if __name__ == "__main__":
     stock = "GME"
-    daily_df, minute_df = fetch_yfinance_data(stock, "2025-06-09")
+    daily_df, minute_df = fetch_yfinance_data(stock, "2025-06-09", cache=BarCache())
     price_trends = compute_price_trends(daily_df, minute_df, periods)
     volume_trends = compute_volume_trends(daily_df, minute_df, periods)
     display_trends_table(stock, price_trends)
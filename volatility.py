@@ -0,0 +1,198 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from data import EXCHANGE_TZ
+
+DEFAULT_VOL_DIR = ".vol_cache"
+
+# Trading days per year. Per-bar volatility is annualised with the bars per day
+# actually fitted, so minute bars with pre and post market (~960 a day) scale correctly
+TRADING_DAYS = 252
+
+
+def log_returns(df, interval, exchange_tz=EXCHANGE_TZ):
+    """
+    Percent log returns of the closes, the scale arch fits best at.
+    For minute bars the first bar of every day is dropped so overnight gaps
+    are not counted as one minute moves.
+
+    Returns:
+    Series: Returns indexed by bar date
+    """
+    df = df.sort_values("date")
+    close = df["close"].to_numpy(dtype=np.float64)
+    returns = pd.Series(100 * np.diff(np.log(close)), index=pd.DatetimeIndex(df["date"].iloc[1:]))
+    if interval == "1m":
+        day = returns.index.tz_convert(exchange_tz).normalize()
+        previous_day = pd.DatetimeIndex(df["date"].iloc[:-1]).tz_convert(exchange_tz).normalize()
+        returns = returns[day == previous_day]
+    return returns.replace([np.inf, -np.inf], np.nan).dropna()
+
+
+def fit_garch(returns, previous=None, vol="GARCH", p=1, o=0, q=1, dist="t", maxiter=500):
+    """
+    Fit a GARCH-family model to one return series, warm-started from the
+    previous fit's parameters when they are given and match the model.
+
+    Parameters:
+    returns (Series): Percent returns from log_returns
+    previous (dict): Parameter name -> value from an earlier fit
+    vol (str): arch volatility process, e.g. 'GARCH' or 'EGARCH'
+    p, o, q (int): Symmetric, asymmetric and lagged variance orders, o=1 gives GJR-GARCH
+    dist (str): Innovation distribution, e.g. 'normal' or 't'
+    maxiter (int): Optimiser iteration limit
+
+    Returns:
+    dict: params, conditional_volatility (Series, percent per bar),
+        forecast (next-bar volatility, percent), iterations, converged, loglikelihood
+    """
+    from arch import arch_model
+
+    model = arch_model(returns, mean="Constant", vol=vol, p=p, o=o, q=q, dist=dist, rescale=False)
+    names = model.parameter_names() + model.volatility.parameter_names() + model.distribution.parameter_names()
+    starting_values = None
+    if previous and list(previous) == names:
+        starting_values = np.array([previous[name] for name in names])
+    result = model.fit(starting_values=starting_values, disp="off", options={"maxiter": maxiter},
+                       show_warning=False)
+    forecast = result.forecast(horizon=1, reindex=False).variance.iloc[-1, 0]
+    return {
+        "params": result.params.to_dict(),
+        "conditional_volatility": result.conditional_volatility,
+        "forecast": float(np.sqrt(forecast)),
+        "iterations": int(result.optimization_result.nit),
+        "converged": result.convergence_flag == 0,
+        "loglikelihood": float(result.loglikelihood),
+    }
+
+
+class VolatilityStore:
+    """
+    Fitted volatility models of the watchlist.
+
+    The latest parameters and volatility of every ticker are kept in one
+    root/interval/params.json loaded once, so a scan-time lookup is a dict
+    access. The conditional volatility series go to one Parquet file per
+    ticker and are only read when asked for.
+    """
+
+    def __init__(self, root=DEFAULT_VOL_DIR):
+        self.root = root
+        self._params = {}
+
+    def _path(self, interval, name):
+        return os.path.join(self.root, interval, name)
+
+    def params(self, interval):
+        """Ticker -> fit summary for an interval, loaded from disk on first use."""
+        if interval not in self._params:
+            path = self._path(interval, "params.json")
+            self._params[interval] = {}
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    self._params[interval] = json.load(f)
+        return self._params[interval]
+
+    def save(self, interval, ticker, summary, conditional_volatility):
+        os.makedirs(self._path(interval, ""), exist_ok=True)
+        path = self._path(interval, f"{ticker.upper()}.parquet")
+        conditional_volatility.rename("volatility").to_frame().to_parquet(path)
+        self.params(interval)[ticker.upper()] = summary
+
+    def flush(self, interval):
+        path = self._path(interval, "params.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.params(interval), f)
+        os.replace(tmp_path, path)
+
+    def current_vol(self, ticker, interval="1d", annualised=True):
+        """
+        Latest next-bar volatility forecast as a fraction (0.05 = 5%), None if the ticker has not been fitted.
+        Minute fits from before bars_per_day was stored cannot be annualised until they are refitted.
+        """
+        summary = self.params(interval).get(ticker.upper())
+        if summary is None or "forecast" not in summary:
+            return None
+        vol = summary["forecast"] / 100
+        if not annualised:
+            return vol
+        per_day = summary.get("bars_per_day", 1 if interval == "1d" else None)
+        return vol * np.sqrt(TRADING_DAYS * per_day) if per_day else None
+
+    def series(self, ticker, interval="1d"):
+        """Conditional volatility per bar in percent."""
+        return pd.read_parquet(self._path(interval, f"{ticker.upper()}.parquet"))["volatility"]
+
+
+def bars_per_day(returns, exchange_tz=EXCHANGE_TZ):
+    """Average number of returns per exchange day, 1 for daily bars."""
+    days = returns.index.tz_convert(exchange_tz).normalize().nunique()
+    return len(returns) / days if days else np.nan
+
+
+def _fit_ticker(args):
+    ticker, returns, previous, kwargs = args
+    if len(returns) < 100:
+        return ticker, {"error": f"only {len(returns)} returns"}, None
+    try:
+        fit = fit_garch(returns, previous, **kwargs)
+    except Exception as e:
+        return ticker, {"error": repr(e)}, None
+    summary = {key: fit[key] for key in ("params", "forecast", "iterations", "converged", "loglikelihood")}
+    summary["nobs"] = len(returns)
+    summary["bars_per_day"] = bars_per_day(returns)
+    summary["fitted_through"] = returns.index[-1].isoformat()
+    summary["warm_start"] = previous is not None
+    return ticker, summary, fit["conditional_volatility"]
+
+
+def fit_many(frames, interval="1d", store=None, processes=None, **kwargs):
+    """
+    Fit every ticker in a process pool, warm-starting from the parameters in
+    the store and saving the new fits to it.
+
+    Parameters:
+    frames (dict): Ticker -> bars DataFrame of the interval
+    interval (str): '1d' or '1m'
+    store (VolatilityStore): Where previous fits are read from and new ones saved
+    processes (int): Number of worker processes, defaults to the CPU count
+    **kwargs: Passed on to fit_garch (vol, p, o, q, dist, maxiter)
+
+    Returns:
+    DataFrame: One row per ticker with forecast, annualised volatility,
+        iterations, warm_start and any error
+    """
+    store = store or VolatilityStore()
+    previous = store.params(interval)
+    jobs = []
+    for ticker, df in frames.items():
+        summary = previous.get(ticker.upper())
+        warm = summary["params"] if summary and "params" in summary else None
+        jobs.append((ticker, log_returns(df, interval), warm, kwargs))
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        for ticker, summary, conditional_volatility in pool.map(_fit_ticker, jobs):
+            if conditional_volatility is not None:
+                store.save(interval, ticker, summary, conditional_volatility)
+            row = {"ticker": ticker, **{k: v for k, v in summary.items() if k != "params"}}
+            if "forecast" in summary:
+                row["annualised_vol"] = store.current_vol(ticker, interval)
+            rows.append(row)
+    store.flush(interval)
+    return pd.DataFrame(rows).set_index("ticker")
+
+
+if __name__ == "__main__":
+    from data import fetch_many
+
+    tickers = pd.read_csv('discord_tickers.csv')["Ticker"].dropna().unique().tolist()
+    frames, report = fetch_many(tickers, pd.Timestamp.now().strftime('%Y-%m-%d'))
+    store = VolatilityStore()
+    daily = fit_many({ticker: daily_df for ticker, (daily_df, _) in frames.items()}, "1d", store)
+    minute = fit_many({ticker: minute_df for ticker, (_, minute_df) in frames.items()}, "1m", store)
+    print(daily.sort_values("annualised_vol", ascending=False).head(20).to_string())
+    print(minute.sort_values("annualised_vol", ascending=False).head(20).to_string())
@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+from trends import periods, _split_periods, _sorted_values
+
+
+def _tails(frames, columns, length):
+    """
+    Right-align the last `length` values of the given columns of every frame
+    into one ticker x length matrix per column, NaN padded on the left for
+    short histories.
+    """
+    matrices = np.full((len(columns), len(frames), length), np.nan)
+    for i, df in enumerate(frames):
+        if df is None or len(df) == 0:
+            continue
+        if isinstance(df, pd.DataFrame):
+            # Frames from fetch_yfinance_data are already sorted, so only the tail is read
+            if not df["date"].is_monotonic_increasing:
+                df = df.sort_values("date")
+            values = np.vstack([df[column].to_numpy(dtype=np.float64)[-length:] for column in columns])
+        else:
+            values = _sorted_values(df, columns)[1][:, -length:]
+        matrices[:, i, length - values.shape[1]:] = values
+    return matrices
+
+
+def percent_change(matrix, windows):
+    """
+    Percent change over every window at the last bar of each row.
+
+    Parameters:
+    matrix (ndarray): Ticker x time matrix of prices, right aligned
+    windows (list): Window lengths in bars
+
+    Returns:
+    ndarray: Ticker x window matrix, NaN where the row is too short
+    """
+    windows = np.asarray(windows, dtype=np.int64)
+    last = matrix[:, -1:]
+    lagged = matrix[:, -1 - windows]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = (last / lagged - 1) * 100
+    change[~np.isfinite(change)] = np.nan
+    return change
+
+
+def relative_volume(matrix, windows):
+    """
+    Average volume over every window relative to the average volume over the
+    longest window (or as much of it as the row has), at the last bar of each
+    row. 1 means the window traded at the usual rate, 3 means three times the
+    usual rate.
+
+    Parameters:
+    matrix (ndarray): Ticker x time matrix of volumes, right aligned
+    windows (list): Window lengths in bars
+
+    Returns:
+    ndarray: Ticker x window matrix, NaN where the row is too short
+    """
+    windows = np.asarray(windows, dtype=np.int64)
+    baseline_window = windows.max()
+    filled = np.nan_to_num(matrix)
+    counts = np.cumsum(~np.isnan(matrix[:, ::-1]), axis=1)
+    sums = np.cumsum(filled[:, ::-1], axis=1)
+    # Column w - 1 of the reversed cumulative sums covers the last w bars
+    window_mean = sums[:, windows - 1] / windows
+    with np.errstate(divide="ignore", invalid="ignore"):
+        baseline = sums[:, baseline_window - 1] / counts[:, baseline_window - 1]
+        ratio = window_mean / baseline[:, None]
+    ratio[counts[:, windows - 1] < windows] = np.nan
+    ratio[~np.isfinite(ratio)] = np.nan
+    return ratio
+
+
+def trend_matrix(frames, periods=periods):
+    """
+    Normalised price and volume trends of every ticker for every period, in
+    one vectorised pass per timeframe.
+
+    Prices are percent changes over the period and volumes are relative to
+    the ticker's own average volume over the longest period of the same
+    timeframe, so tickers at any price or size can be compared.
+
+    Parameters:
+    frames (dict): Ticker -> (daily_df, minute_df), DataFrames or Bars
+    periods (list): (label, window) pairs, daily periods first
+
+    Returns:
+    DataFrame: One row per ticker, 'price_<label>' and 'volume_<label>' columns,
+        e.g. price_1w, volume_1h and price_1m_min for the 1 minute period
+    """
+    tickers = list(frames)
+    out = pd.DataFrame(index=pd.Index(tickers, name="Ticker"))
+    daily_labels = [label for label, _ in _split_periods(periods)[0]]
+    for position, frame_periods in enumerate(_split_periods(periods)):
+        if not frame_periods:
+            continue
+        labels = [label for label, _ in frame_periods]
+        # '1m' is both a month and a minute, so minute labels that clash get a suffix
+        if position == 1:
+            labels = [f"{label}_min" if label in daily_labels else label for label in labels]
+        windows = [window for _, window in frame_periods]
+        length = max(windows) + 1
+        selected = [frames[ticker][position] for ticker in tickers]
+        close, volume = _tails(selected, ("close", "volume"), length)
+        price = percent_change(close, windows)
+        volume = relative_volume(volume, windows)
+        for j, label in enumerate(labels):
+            out[f"price_{label}"] = price[:, j]
+            out[f"volume_{label}"] = volume[:, j]
+    return out
+
+
+def _fingerprint(df):
+    # Bars change when a bar is appended or the last (still forming) bar is updated
+    if df is None or len(df) == 0:
+        return (0,)
+    if isinstance(df, pd.DataFrame):
+        dates = df["date"]
+        last = len(df) - 1 if dates.is_monotonic_increasing else dates.values.argmax()
+        return (len(df), dates.iat[last].value, float(df["close"].iat[last]), float(df["volume"].iat[last]))
+    return (len(df), int(df["date"][-1]), float(df["close"][-1]), float(df["volume"][-1]))
+
+
+class WatchlistScanner:
+    """
+    Cross-sectional ranking of a watchlist by its normalised trend matrix.
+
+    update() only recomputes the tickers whose bars changed since the last
+    call, so a large universe can be re-ranked every minute at the cost of
+    the tickers that actually traded.
+    """
+
+    def __init__(self, periods=periods):
+        self.periods = periods
+        self.matrix = pd.DataFrame()
+        self.fingerprints = {}
+        self.stats = {"updates": 0, "recomputed": 0}
+
+    def update(self, frames):
+        """
+        Parameters:
+        frames (dict): Ticker -> (daily_df, minute_df) for new or changed tickers,
+            unchanged tickers may be passed too and are skipped
+
+        Returns:
+        list: Tickers that were recomputed
+        """
+        fingerprints = {ticker: (_fingerprint(daily_df), _fingerprint(minute_df))
+                        for ticker, (daily_df, minute_df) in frames.items()}
+        changed = [ticker for ticker, fp in fingerprints.items() if self.fingerprints.get(ticker) != fp]
+        self.stats["updates"] += 1
+        if not changed:
+            return []
+        rows = trend_matrix({ticker: frames[ticker] for ticker in changed}, self.periods)
+        if self.matrix.empty:
+            self.matrix = rows
+        else:
+            self.matrix = pd.concat([self.matrix.drop(index=changed, errors="ignore"), rows])
+        self.fingerprints.update((ticker, fingerprints[ticker]) for ticker in changed)
+        self.stats["recomputed"] += len(changed)
+        return changed
+
+    def remove(self, ticker):
+        self.matrix = self.matrix.drop(index=ticker, errors="ignore")
+        self.fingerprints.pop(ticker, None)
+
+    def scores(self, columns=None):
+        """
+        Composite score: the mean cross-sectional z-score of the given columns,
+        by default every price column.
+        """
+        if columns is None:
+            columns = [column for column in self.matrix.columns if column.startswith("price_")]
+        values = self.matrix[columns]
+        z = (values - values.mean()) / values.std(ddof=0).replace(0, np.nan)
+        return z.mean(axis=1)
+
+    def rank(self, by=None, top=20, ascending=False):
+        """
+        Parameters:
+        by (str): Matrix column to rank by, None for the composite score
+        top (int): Number of tickers to return
+        ascending (bool): Return the biggest losers instead of the biggest gainers
+
+        Returns:
+        DataFrame: The top rows of the matrix with a score column, best first
+        """
+        if self.matrix.empty:
+            return self.matrix
+        ranked = self.matrix.copy()
+        ranked.insert(0, "score", ranked[by] if by is not None else self.scores())
+        ranked = ranked.sort_values("score", ascending=ascending, na_position="last")
+        return ranked.head(top)
+
+
+def display_ranking(ranked, columns=None):
+    if columns is not None:
+        ranked = ranked[["score", *columns]]
+    print(tabulate(ranked.round(2), headers="keys", tablefmt="github"))
+
+
+if __name__ == "__main__":
+    import argparse
+    from data import fetch_many
+    from instrument import add_arguments, from_args
+
+    parser = argparse.ArgumentParser(description="Rank a watchlist by normalised price and volume trends")
+    parser.add_argument("tickers", nargs="*", help="Tickers to scan, defaults to every ticker in --csv")
+    parser.add_argument("--csv", default="discord_tickers.csv")
+    parser.add_argument("--end", default=pd.Timestamp.now().strftime('%Y-%m-%d'))
+    parser.add_argument("--by", default=None, help="Column to rank by, e.g. price_1h, defaults to the composite score")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--losers", action="store_true")
+    add_arguments(parser)
+    args = parser.parse_args()
+    from_args(args)
+
+    tickers = args.tickers or pd.read_csv(args.csv)["Ticker"].dropna().unique().tolist()
+    frames, report = fetch_many(tickers, args.end)
+    scanner = WatchlistScanner()
+    scanner.update(frames)
+    ranked = scanner.rank(args.by, args.top, ascending=args.losers)
+    display_ranking(ranked, ["price_1w", "price_1d", "price_1h", "volume_1d", "volume_1h"])